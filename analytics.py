@@ -0,0 +1,124 @@
+from typing import NamedTuple, Union
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+SHORT_MA_WINDOW = 20
+LONG_MA_WINDOW = 50
+VOLATILITY_WINDOW = 21  # about one month of sessions, the window the stock card has always used
+
+STRONG_BUY = "✅ Strong Buy"
+HOLD = "⚠️ Hold"
+SELL = "🚨 Sell"
+ADVICE = {
+    STRONG_BUY: "Uptrend confirmed! Buying now may be profitable.",
+    HOLD: "Stock above short-term trend but below long-term average. Watch carefully.",
+    SELL: "Stock below both moving averages. Consider selling.",
+}
+
+
+class StockData(NamedTuple):
+    """Single-ticker analysis shown on the stock card (field order matches the old 11-tuple)."""
+    latest_price: float
+    high_price: float
+    low_price: float
+    volume: int
+    recommendation: str
+    advice: str
+    yearly_change: float
+    price_change: float
+    price_change_pct: float
+    volatility: Union[float, str]  # "N/A" when there are too few bars
+    health: str
+
+
+def trailing_window(history, months=1):
+    """Return the trailing `months` of daily bars of a history frame."""
+    if history.empty:
+        return history
+    start = history.index[-1] - pd.DateOffset(months=months)
+    return history[history.index > start]
+
+
+def recommend(latest, short_ma, long_ma):
+    """Moving-average trend recommendation, element-wise over arrays of prices."""
+    latest, short_ma, long_ma = np.asarray(latest), np.asarray(short_ma), np.asarray(long_ma)
+    return np.select(
+        [(latest > short_ma) & (short_ma > long_ma), latest > short_ma],
+        [STRONG_BUY, HOLD],
+        default=SELL,
+    )
+
+
+def analyze_panel(close):
+    """Compute the stock-card indicators for every column of a (dates x tickers) close-price panel.
+
+    Returns a DataFrame indexed by ticker.
+    """
+    close = close.dropna(how="all").ffill()
+    latest = close.iloc[-1]
+    previous = close.iloc[-2] if len(close) > 1 else latest
+    price_change = latest - previous
+
+    returns = close.pct_change(fill_method=None).iloc[-VOLATILITY_WINDOW:]
+    volatility = returns.std() * np.sqrt(TRADING_DAYS)
+
+    short_ma = close.rolling(SHORT_MA_WINDOW).mean().iloc[-1]
+    long_ma = close.rolling(LONG_MA_WINDOW).mean().iloc[-1]
+    first = close.bfill().iloc[0]
+
+    result = pd.DataFrame({
+        "latest_price": latest,
+        "price_change": price_change,
+        "price_change_pct": (price_change / previous * 100).where(previous != 0, 0.0),
+        "volatility": volatility,
+        "short_term_ma": short_ma,
+        "long_term_ma": long_ma,
+        "yearly_change": (latest - first) / first * 100,
+    })
+    result["recommendation"] = recommend(latest, short_ma, long_ma)
+    return result
+
+
+def financial_health(info):
+    """Rough health label from P/E and dividend yield."""
+    pe = info.get("trailingPE", float("inf"))
+    div_yield = info.get("dividendYield", 0)
+    return "Strong" if pe < 20 and div_yield > 0.02 else "Moderate" if pe < 30 else "Weak"
+
+
+def analyze_history(history, info, latest_price=None, state=None):
+    """Analyze one ticker's 1-year daily history with the same column-wise math as analyze_panel.
+
+    `latest_price` (a live quote) stands in for the last close when given. With an
+    IndicatorState for the ticker, the moving averages and volatility come from its running
+    sums instead of being recomputed over the history. Returns a StockData, or None if there
+    is no history.
+    """
+    if history.empty:
+        return None
+    if state is not None:
+        row = state.refresh(history, latest_price)
+        first = history["Close"].dropna().iloc[0]
+        row["yearly_change"] = (row["latest_price"] - first) / first * 100
+    else:
+        close = history["Close"].copy()
+        if latest_price is not None:
+            close.iloc[-1] = latest_price
+        row = analyze_panel(close.to_frame("close")).iloc[0]
+    month = trailing_window(history, months=1)
+    volatility = float(row["volatility"]) if not np.isnan(row["volatility"]) else "N/A"
+    return StockData(
+        latest_price=float(row["latest_price"]),
+        high_price=float(month["High"].max()),
+        low_price=float(month["Low"].min()),
+        volume=int(history["Volume"].iloc[-1]),
+        recommendation=str(row["recommendation"]),
+        advice=ADVICE[row["recommendation"]],
+        yearly_change=float(row["yearly_change"]),
+        price_change=float(row["price_change"]),
+        price_change_pct=float(row["price_change_pct"]),
+        volatility=volatility,
+        health=financial_health(info),
+    )
@@ -0,0 +1,6 @@
+"""ASGI entry point, e.g. `uvicorn asgi:asgi_app --port 5001`."""
+from asgiref.wsgi import WsgiToAsgi
+
+from main import create_app
+
+asgi_app = WsgiToAsgi(create_app())
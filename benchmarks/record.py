@@ -0,0 +1,162 @@
+"""Record the Yahoo responses the benchmarks replay (see replay.py) into benchmarks/fixtures/.
+
+    python benchmarks/record.py               # live Yahoo search/history/info, needs network
+    python benchmarks/record.py --synthetic   # deterministic stand-ins in the same format, no network
+
+Layout: search.json ({query: search response}), info.json ({ticker: info dict}),
+history/<TICKER>.csv (1 year of daily bars) and meta.json (source, time, company names).
+"""
+import argparse
+import json
+import os
+import sys
+import zlib
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Company names the load benchmarks look up, with the ticker each should resolve to.
+# Names missing from data/symbols.csv exercise the live-search path.
+COMPANIES = {
+    "Reliance Industries": "RELIANCE.NS",
+    "tcs": "TCS.NS",
+    "HDFC Bank": "HDFCBANK.NS",
+    "infosys": "INFY.NS",
+    "ITC": "ITC.NS",
+    "Eternal": "ETERNAL.NS",
+    "Paytm": "PAYTM.NS",
+}
+# Searched too, but only listed outside NSE/BSE ("Only Indian stocks" path)
+FOREIGN_QUERIES = {"apple": ("AAPL", "NMS")}
+
+# (sector, industry) per ticker for the synthetic info dicts, so sector filters and groupings see a mix
+SECTORS = {
+    "RELIANCE.NS": ("Energy", "Oil & Gas Refining & Marketing"),
+    "TCS.NS": ("Technology", "Information Technology Services"),
+    "HDFCBANK.NS": ("Financial Services", "Banks - Regional"),
+    "INFY.NS": ("Technology", "Information Technology Services"),
+    "ITC.NS": ("Consumer Defensive", "Tobacco"),
+    "ETERNAL.NS": ("Consumer Cyclical", "Internet Retail"),
+    "PAYTM.NS": ("Technology", "Software - Infrastructure"),
+}
+
+HISTORY_COLUMNS = ["Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits"]
+
+
+def _seed(ticker):
+    return zlib.crc32(ticker.encode())
+
+
+def synthetic_history(ticker, sessions=250, end="2025-06-30"):
+    """A year of geometric-random-walk daily bars, the same for a ticker on every run."""
+    rng = np.random.default_rng(_seed(ticker))
+    index = pd.bdate_range(end=end, periods=sessions, tz="Asia/Kolkata", name="Date")
+    close = (500 + _seed(ticker) % 2500) * np.exp(np.cumsum(rng.normal(0.0004, 0.016, sessions)))
+    spread = np.abs(rng.normal(0, 0.008, sessions))
+    open_ = close * (1 + rng.normal(0, 0.004, sessions))
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) * (1 + spread),
+        "Low": np.minimum(open_, close) * (1 - spread),
+        "Close": close,
+        "Volume": rng.integers(200_000, 20_000_000, sessions),
+        "Dividends": 0.0,
+        "Stock Splits": 0.0,
+    }, index=index)
+
+
+def synthetic_info(ticker, name, history):
+    rng = np.random.default_rng(_seed(ticker) + 1)
+    sector, industry = SECTORS.get(ticker, ("Technology", "Information Technology Services"))
+    close = history["Close"]
+    eps = float(close.iloc[-1] / rng.uniform(12, 60))
+    return {
+        "symbol": ticker,
+        "longName": f"{name.title()} Limited",
+        "sector": sector,
+        "industry": industry,
+        "companyOfficers": [{"name": "Synthetic CEO", "title": "CEO & MD"}],
+        "marketCap": int(close.iloc[-1] * rng.integers(10**8, 10**10)),
+        "trailingPE": round(float(close.iloc[-1]) / eps, 2),
+        "trailingEps": round(eps, 2),
+        "dividendYield": round(float(rng.uniform(0, 3)), 2),
+        "website": f"https://www.{ticker.split('.')[0].lower()}.example",
+        "longBusinessSummary": f"Synthetic fixture for {ticker}; re-record with benchmarks/record.py.",
+        "fiftyTwoWeekHigh": round(float(close.max()), 2),
+        "fiftyTwoWeekLow": round(float(close.min()), 2),
+        "beta": round(float(rng.uniform(0.5, 1.5)), 3),
+        "averageVolume": int(history["Volume"].mean()),
+        "currency": "INR",
+        "exchange": "NSI",
+    }
+
+
+def _search_response(quotes):
+    return {"count": len(quotes), "quotes": quotes, "news": []}
+
+
+def synthetic_fixtures():
+    search, info, histories = {}, {}, {}
+    for name, ticker in COMPANIES.items():
+        histories[ticker] = synthetic_history(ticker)
+        info[ticker] = synthetic_info(ticker, name, histories[ticker])
+        search[name] = _search_response([{"exchange": "NSI", "symbol": ticker, "shortname": name,
+                                          "quoteType": "EQUITY"}])
+    for query, (symbol, exchange) in FOREIGN_QUERIES.items():
+        search[query] = _search_response([{"exchange": exchange, "symbol": symbol, "shortname": query,
+                                           "quoteType": "EQUITY"}])
+    return search, info, histories
+
+
+def live_fixtures():
+    sys.path.insert(0, ROOT)
+    import yfinance as yf
+    from upstream import call_yahoo, get_session, search as yahoo_search
+
+    search, info, histories = {}, {}, {}
+    for name, ticker in COMPANIES.items():
+        stock = yf.Ticker(ticker, session=get_session())
+        histories[ticker] = call_yahoo(stock.history, period="1y", interval="1d")
+        info[ticker] = call_yahoo(lambda: stock.info)
+        search[name] = yahoo_search(name)
+    for query in FOREIGN_QUERIES:
+        search[query] = yahoo_search(query)
+    return search, info, histories
+
+
+def write_fixtures(search, info, histories, source, path=FIXTURES_DIR):
+    os.makedirs(os.path.join(path, "history"), exist_ok=True)
+    with open(os.path.join(path, "search.json"), "w") as f:
+        json.dump(search, f, indent=1, sort_keys=True, default=str)
+    with open(os.path.join(path, "info.json"), "w") as f:
+        json.dump(info, f, indent=1, sort_keys=True, default=str)
+    for ticker, history in histories.items():
+        history.reindex(columns=HISTORY_COLUMNS, fill_value=0.0).to_csv(
+            os.path.join(path, "history", f"{ticker}.csv"), float_format="%.4f")
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({
+            "source": source,
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "companies": COMPANIES,
+            "foreign_queries": list(FOREIGN_QUERIES),
+        }, f, indent=1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--synthetic", action="store_true", help="generate deterministic fixtures offline")
+    parser.add_argument("--output", default=FIXTURES_DIR, help="fixtures directory")
+    args = parser.parse_args(argv)
+    if args.synthetic:
+        write_fixtures(*synthetic_fixtures(), source="synthetic", path=args.output)
+    else:
+        write_fixtures(*live_fixtures(), source="yahoo", path=args.output)
+    print(f"Wrote fixtures for {len(COMPANIES)} companies to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
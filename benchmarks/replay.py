@@ -0,0 +1,133 @@
+"""Serve the recorded fixtures in place of Yahoo and MongoDB so the app runs with no network.
+
+install() must run before the app serves its first request: the app looks up MongoClient,
+yfinance and the Yahoo search function when it first needs them.
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+
+from record import FIXTURES_DIR, ROOT
+
+MARKET_TZ = "Asia/Kolkata"
+
+
+class Fixtures:
+    """Recorded search/info/history responses, loaded once.
+
+    History dates are shifted so the last bar falls on the previous business day, which keeps
+    date-dependent paths (incremental history, "completed session" checks) the same on every run.
+    """
+
+    def __init__(self, path=FIXTURES_DIR):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        with open(os.path.join(path, "search.json")) as f:
+            self.search = json.load(f)
+        with open(os.path.join(path, "info.json")) as f:
+            self.info = json.load(f)
+        self._histories = {}
+        self._lock = threading.Lock()
+
+    @property
+    def companies(self):
+        return self.meta["companies"]
+
+    def history(self, ticker):
+        with self._lock:
+            if ticker not in self._histories:
+                self._histories[ticker] = self._load_history(ticker)
+            return self._histories[ticker]
+
+    def _load_history(self, ticker):
+        path = os.path.join(self.path, "history", f"{ticker}.csv")
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        history = pd.read_csv(path, index_col="Date")
+        end = pd.Timestamp.now(tz=MARKET_TZ).normalize() - pd.offsets.BDay(1)
+        history.index = pd.bdate_range(end=end.tz_localize(None), periods=len(history), tz=MARKET_TZ, name="Date")
+        return history
+
+
+def install(fixtures=None, mongo_uri=None, latency=0.0):
+    """Patch yfinance, the Yahoo search and MongoClient to replay `fixtures`.
+
+    MongoDB is mongomock unless `mongo_uri` points at a local mongod. `latency` (seconds) is
+    slept per replayed Yahoo call to stand in for the network round trip.
+    """
+    sys.path.insert(0, ROOT)
+
+    import pymongo
+    import yfinance as yf
+    import upstream
+
+    fixtures = fixtures or Fixtures()
+    calls = {"search": 0, "history": 0, "info": 0, "quote": 0, "download": 0}
+
+    def replayed(kind):
+        calls[kind] += 1
+        if latency:
+            time.sleep(latency)
+
+    class ReplayTicker:
+        def __init__(self, ticker, session=None):
+            self.ticker = ticker
+
+        def history(self, period="1y", interval="1d", start=None, **kwargs):
+            replayed("history")
+            history = fixtures.history(self.ticker)
+            if start is not None and not history.empty:
+                history = history[history.index >= pd.Timestamp(start).tz_localize(MARKET_TZ)]
+            return history.copy()
+
+        @property
+        def info(self):
+            replayed("info")
+            return dict(fixtures.info.get(self.ticker, {}))
+
+        @property
+        def fast_info(self):
+            replayed("quote")
+            history = fixtures.history(self.ticker)
+            if history.empty:
+                raise KeyError("last_price")
+            return {"last_price": float(history["Close"].iloc[-1])}
+
+    def download(tickers, group_by="column", start=None, **kwargs):
+        # Like yf.download's daily bars: no dividend/split columns and a tz-naive index
+        replayed("download")
+        if isinstance(tickers, str):
+            tickers = tickers.split()
+        frames = {}
+        for ticker in tickers:
+            history = fixtures.history(ticker)
+            if history.empty:
+                continue
+            history = history.drop(columns=["Dividends", "Stock Splits"])
+            history.index = history.index.tz_localize(None)
+            frames[ticker] = history if start is None else history[history.index >= pd.Timestamp(start)]
+        if not frames:
+            return pd.DataFrame()
+        data = pd.concat(frames, axis=1)
+        return data if group_by == "ticker" else data.swaplevel(0, 1, axis=1).sort_index(axis=1)
+
+    def search(query, quotes_count=10):
+        replayed("search")
+        return fixtures.search.get(query, {"count": 0, "quotes": [], "news": []})
+
+    yf.Ticker = ReplayTicker
+    yf.download = download
+    upstream.search = search
+
+    if mongo_uri is None:
+        import mongomock
+        pymongo.MongoClient = mongomock.MongoClient
+    else:
+        real_client = pymongo.MongoClient
+        pymongo.MongoClient = lambda host=None, **kwargs: real_client(mongo_uri, **kwargs)
+    return calls
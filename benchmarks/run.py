@@ -0,0 +1,310 @@
+"""Offline benchmarks: page latency/throughput under load, analytics microbenchmarks and cold start.
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --baseline results.json     # exit 1 on regressions past --tolerance
+
+Yahoo is replayed from benchmarks/fixtures (see record.py) and MongoDB is mongomock unless
+--mongo-uri names a local mongod, so runs need no network and are repeatable.
+"""
+import argparse
+import importlib
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+import replay
+from record import ROOT
+
+LOAD_METRICS = ("p50_ms", "p99_ms")  # compared against the baseline; lower is better
+MICRO_METRIC = "median_us"
+STARTUP_METRICS = ("median_ms", "max_rss_mb")
+
+# Run in a fresh interpreter: import the app module and build the app, as a server worker does
+# (ru_maxrss would report this benchmark's own peak, which a child inherits across exec on Linux)
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+import main
+main.create_app({"SECRET_KEY": "benchmark"})
+elapsed = time.perf_counter() - start
+with open("/proc/self/status") as f:
+    peak_kib = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+print(elapsed, peak_kib)
+"""
+
+
+def summarize(latencies, wall, errors):
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "wall_s": round(wall, 4),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(latencies_ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "max_ms": round(float(latencies_ms.max()), 3),
+    }
+
+
+def run_load(app, send, total, concurrency, setup=None):
+    """Send `total` requests from `concurrency` threads, one test client (cookie jar) per thread.
+
+    `send(client, i)` returns True when the response is what a user should get; `setup(client)`
+    runs untimed before a thread starts sending.
+    """
+    def worker(indices):
+        client = app.test_client()
+        if setup:
+            setup(client)
+        timings, failures = [], 0
+        for i in indices:
+            start = perf_counter()
+            ok = send(client, i)
+            timings.append(perf_counter() - start)
+            failures += not ok
+        return timings, failures
+
+    shards = [range(n, total, concurrency) for n in range(min(concurrency, total))]
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+        results = list(pool.map(worker, shards))
+    wall = perf_counter() - start
+    return summarize([t for timings, _ in results for t in timings], wall, sum(f for _, f in results))
+
+
+def microbench(fn, repeat):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    per_call = [t / number for t in timer.repeat(repeat, number)]
+    return {
+        "calls": number * repeat,
+        "best_us": round(min(per_call) * 1e6, 3),
+        "median_us": round(statistics.median(per_call) * 1e6, 3),
+    }
+
+
+def reset(app):
+    """Empty every cache and the MongoDB collections, so the next request goes all the way upstream."""
+    services = app.extensions["services"]
+    market_data = services.market
+    for cache in (market_data.quote_cache, market_data.history_cache, market_data.bulk_history_cache,
+                  market_data.info_cache):
+        cache.clear()
+    services.write_buffer.flush()
+    services.write_buffer._written.clear()
+    services.collection.delete_many({})
+    if services.price_store is not None:
+        services.price_store.collection.delete_many({})
+    services.reset("symbol_index")
+
+
+def load_benchmarks(app, fixtures, total, concurrency):
+    companies = list(fixtures.companies.items())
+
+    def lookup(client, i):
+        name, ticker = companies[i % len(companies)]
+        body = client.post("/", data={"company_name": name}).get_data(as_text=True)
+        return f"({ticker})" in body  # the stock card heading
+
+    def recalculate(client, i):
+        name, _ = companies[i % len(companies)]
+        response = client.post("/", data={"company_name": name, "amount": 10_000 + i, "years": 1 + i % 30})
+        return "Investment" in response.get_data(as_text=True)
+
+    def projection_api(client, i):
+        _, ticker = companies[i % len(companies)]
+        response = client.post("/api/projection", json={"ticker": ticker, "amount": 10_000 + i, "years": 1 + i % 30})
+        return response.status_code == 200
+
+    etags = {}
+
+    def stock_page(client, i):
+        # Repeat views revalidate with the ETag of the previous response
+        _, ticker = companies[i % len(companies)]
+        headers = {"If-None-Match": etags[ticker]} if ticker in etags else {}
+        response = client.get(f"/stock/{ticker}", headers=headers)
+        etags[ticker] = response.headers.get("ETag", etags.get(ticker))
+        return response.status_code in (200, 304)
+
+    def batch(client, i):
+        return client.post("/api/batch", json={"tickers": [ticker for _, ticker in companies]}).status_code == 200
+
+    def history(client, i):
+        return client.get("/history").status_code == 200
+
+    def with_history(client):
+        with client.session_transaction() as sess:
+            sess["history"] = [name for name, _ in companies] * 3
+
+    results = {}
+    reset(app)
+    # Cold: one pass over every company with empty caches and database
+    results["lookup_cold"] = run_load(app, lookup, len(companies), concurrency)
+    results["lookup_warm"] = run_load(app, lookup, total, concurrency)
+    results["recalculate"] = run_load(app, recalculate, total, concurrency)
+    results["projection_api"] = run_load(app, projection_api, total, concurrency)
+    results["stock_page_revalidate"] = run_load(app, stock_page, total, concurrency)
+    # Half the histories cached from single-ticker views, half bulk-downloaded: the two must line up
+    for _, ticker in companies[::2]:
+        app.extensions["services"].market.history_cache.invalidate(ticker)
+    results["batch"] = run_load(app, batch, total, concurrency)
+    results["history"] = run_load(app, history, total, concurrency, setup=with_history)
+    app.extensions["services"].write_buffer.flush()
+    return results
+
+
+def micro_benchmarks(fixtures, repeat):
+    from analytics import analyze_history, analyze_panel, trailing_window
+    from cache import TTLCache
+    from indicators import IndicatorState
+    from portfolio import analyze_portfolio
+    from projections import project_grid, project_investment, simulate_investment
+    from symbols import DEFAULT_SYMBOL_MASTER, load_symbol_index
+
+    ticker = next(iter(fixtures.companies.values()))
+    history = fixtures.history(ticker)
+    info = fixtures.info[ticker]
+    latest = float(history["Close"].iloc[-1])
+    volatility = float(history["Close"].pct_change().std() * 100)
+    returns = history["Close"].pct_change().dropna().to_numpy()
+    details = {"Beta": info.get("beta", "N/A"), "Dividend Yield": info.get("dividendYield", "N/A") or 0}
+
+    # A 100-ticker panel built from the fixtures, for the watchlist analytics
+    closes = [fixtures.history(t)["Close"] for t in fixtures.companies.values()]
+    panel = pd.DataFrame({f"T{i}": closes[i % len(closes)] * (1 + i / 100) for i in range(100)})
+
+    index = load_symbol_index(DEFAULT_SYMBOL_MASTER)
+    cache = TTLCache(maxsize=1024, ttl=60)
+    cache.set("INFY.NS", latest)
+    state = IndicatorState.from_history(history)
+
+    cases = {
+        "analyze_history": lambda: analyze_history(history, info, latest_price=latest),
+        "analyze_history_incremental": lambda: analyze_history(history, info, latest_price=latest, state=state),
+        "indicator_tick": lambda: state.tick(latest),
+        "analyze_panel_100": lambda: analyze_panel(panel),
+        "trailing_window_6m": lambda: trailing_window(history, 6),
+        "project_investment": lambda: project_investment(100_000, 10, latest, details, volatility),
+        "project_grid_10x8x5": lambda: project_grid(
+            np.linspace(10_000, 100_000, 10), [1, 3, 5, 10, 15, 20, 25, 30], [0.04, 0.06, 0.08, 0.1, 0.12],
+            latest, 1.0, 1.0),
+        "analyze_portfolio_100": lambda: analyze_portfolio(
+            panel, amounts=pd.Series(10_000.0, index=panel.columns), years=10),
+        "simulate_investment_10k": lambda: simulate_investment(returns, 100_000, 10, n_paths=10_000, seed=0),
+        "symbol_lookup_exact": lambda: index.lookup("infosys"),
+        "symbol_lookup_fuzzy": lambda: index.lookup("infosis"),
+        "ttl_cache_hit": lambda: cache.get("INFY.NS"),
+    }
+    return {name: microbench(fn, repeat) for name, fn in cases.items()}
+
+
+def startup_benchmarks(repeat):
+    """Cold start: seconds to import main and call create_app(), and the process's peak memory."""
+    seconds, rss = [], []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=ROOT, capture_output=True,
+                             text=True, check=True).stdout.split()
+        seconds.append(float(out[0]))
+        rss.append(int(out[1]) / 1024)
+    return {"create_app": {
+        "runs": repeat,
+        "median_ms": round(statistics.median(seconds) * 1000, 1),
+        "max_rss_mb": round(max(rss), 1),
+    }}
+
+
+def compare(results, baseline, tolerance):
+    """List every metric that is more than `tolerance` (a fraction) slower than the baseline."""
+    regressions = []
+    checks = [("load", name, metric) for name in results["load"] for metric in LOAD_METRICS]
+    checks += [("micro", name, MICRO_METRIC) for name in results["micro"]]
+    checks += [("startup", name, metric) for name in results["startup"] for metric in STARTUP_METRICS]
+    for section, name, metric in checks:
+        before = baseline.get(section, {}).get(name, {}).get(metric)
+        after = results[section][name][metric]
+        if before and after > before * (1 + tolerance):
+            regressions.append(f"{section}.{name}.{metric}: {before} -> {after} (+{after / before - 1:.0%})")
+    for name, stats in results["load"].items():
+        if stats["errors"]:
+            regressions.append(f"load.{name}: {stats['errors']} of {stats['requests']} responses were wrong")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="requests per load scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent client threads")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repeats per microbenchmark")
+    parser.add_argument("--upstream-latency", type=float, default=0.0,
+                        help="seconds slept per replayed Yahoo call, to mimic the network")
+    parser.add_argument("--mongo-uri", help="use this MongoDB instead of mongomock")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-startup", action="store_true")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, e.g. 0.25 = 25%%")
+    args = parser.parse_args(argv)
+
+    fixtures = replay.Fixtures()
+    calls = replay.install(fixtures, mongo_uri=args.mongo_uri, latency=args.upstream_latency)
+    app = importlib.import_module("main").create_app({"TESTING": True, "PREFETCH_ENABLED": False})
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "fixtures": fixtures.meta["source"],
+            "mongo": args.mongo_uri or "mongomock",
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "upstream_latency_s": args.upstream_latency,
+        },
+        "load": {} if args.skip_load else load_benchmarks(app, fixtures, args.requests, args.concurrency),
+        "micro": {} if args.skip_micro else micro_benchmarks(fixtures, args.repeat),
+        "startup": {} if args.skip_startup else startup_benchmarks(args.repeat),
+    }
+    results["upstream_calls"] = dict(calls)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        results["regressions"] = regressions
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
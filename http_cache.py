@@ -0,0 +1,125 @@
+import gzip
+import hashlib
+import os
+
+from flask import request, session
+from werkzeug.security import safe_join
+
+from cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # optional; responses are gzip-compressed without it
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    "text/html", "text/css", "text/plain", "text/javascript",
+    "application/javascript", "application/json", "image/svg+xml",
+}
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+class StaticVersions:
+    """Short content hashes of static files for `?v=` cache-busting URLs, recomputed when a file changes."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._hashes = {}  # filename -> (mtime, digest)
+
+    def get(self, filename):
+        path = safe_join(self.folder, filename)
+        if path is None:
+            raise FileNotFoundError(filename)
+        mtime = os.stat(path).st_mtime
+        cached = self._hashes.get(filename)
+        if cached is None or cached[0] != mtime:
+            with open(path, "rb") as f:
+                cached = self._hashes[filename] = (mtime, hashlib.sha256(f.read()).hexdigest()[:12])
+        return cached[1]
+
+
+def choose_encoding(accept_encodings):
+    """The best encoding both sides support: brotli when installed and accepted, else gzip, else None."""
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(data, encoding, level=6):
+    if encoding == "br":
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def configure_http_cache(app):
+    """Register response hooks for conditional GETs, compression and far-future static caching.
+
+    - url_for('static', ...) gets a `?v=<content hash>` parameter, and a request carrying the
+      current hash is cached for a year as immutable; other static requests for STATIC_MAX_AGE.
+    - GET responses without an ETag get one from their body and are answered with 304 Not
+      Modified when the client already has it (views can set a cheaper ETag themselves).
+    - Text responses are gzip- or brotli-compressed per Accept-Encoding; compressed static
+      files are kept in memory by ETag.
+    """
+    app.config.setdefault("HTTP_COMPRESSION", True)
+    app.config.setdefault("COMPRESSION_LEVEL", 6)
+    app.config.setdefault("COMPRESSION_MIN_SIZE", 500)  # bytes; smaller bodies are sent as-is
+    app.config.setdefault("STATIC_MAX_AGE", 24 * 60 * 60)  # for static URLs without a content hash
+    versions = StaticVersions(app.static_folder)
+    compressed_static = TTLCache(maxsize=256, ttl=60 * 60)  # (etag, encoding) -> bytes
+
+    @app.url_defaults
+    def _static_version(endpoint, values):
+        if endpoint == "static" and "filename" in values and "v" not in values:
+            try:
+                values["v"] = versions.get(values["filename"])
+            except OSError:
+                pass
+
+    @app.after_request
+    def _cache_and_compress(response):
+        if request.endpoint == "static":
+            try:
+                current = request.args.get("v") == versions.get(request.view_args["filename"])
+            except (OSError, KeyError):
+                current = False
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE if current else app.config["STATIC_MAX_AGE"]
+            response.cache_control.immutable = current
+        elif request.method in ("GET", "HEAD") and response.status_code == 200 and not response.is_streamed:
+            if not response.get_etag()[0]:
+                response.add_etag()
+            response.cache_control.no_cache = True  # always revalidate; a match costs a 304
+            if session.accessed:
+                response.cache_control.private = True
+            response.make_conditional(request)
+
+        if (not app.config["HTTP_COMPRESSION"] or response.status_code != 200
+                or response.mimetype not in COMPRESSIBLE_TYPES or "Content-Encoding" in response.headers):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        static = response.direct_passthrough  # send_file: a file to read, not a streamed view
+        if response.is_streamed and not static:
+            return response  # e.g. Server-Sent Events
+        response.direct_passthrough = False
+        data = response.get_data()
+        if len(data) < app.config["COMPRESSION_MIN_SIZE"]:
+            return response
+        etag = response.get_etag()[0]
+        key = (etag, encoding)
+        body = compressed_static.get(key) if static and etag else None
+        if body is None:
+            body = compress(data, encoding, app.config["COMPRESSION_LEVEL"])
+            if static and etag:
+                compressed_static.set(key, body)
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        if etag:
+            response.set_etag(etag, weak=True)  # same resource, different bytes
+        return response
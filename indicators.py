@@ -0,0 +1,183 @@
+import math
+import threading
+
+import numpy as np
+
+from analytics import LONG_MA_WINDOW, SHORT_MA_WINDOW, TRADING_DAYS, VOLATILITY_WINDOW, recommend
+
+# Rolling sums drift by floating-point error; recompute them exactly this often
+RESYNC_EVERY = 10_000
+
+
+class RollingWindow:
+    """Mean and sample variance of the last `size` values, updated in O(1) (windowed Welford).
+
+    Values live in a fixed-size NumPy ring buffer: append() past `size` evicts the oldest value,
+    and replace_last() revises the newest one, e.g. a live tick moving today's close.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0  # sum of squared deviations from the mean
+        self._values = np.zeros(size)
+        self._start = 0  # position of the oldest value
+        self._updates = 0
+
+    @property
+    def full(self):
+        return self.count == self.size
+
+    def values(self):
+        """The window's values, oldest first."""
+        return np.roll(self._values, -self._start)[:self.count]
+
+    def variance(self):
+        """Sample variance (ddof=1, as pandas), NaN with fewer than two values."""
+        return max(self._m2, 0.0) / (self.count - 1) if self.count > 1 else math.nan
+
+    def append(self, value):
+        if self.count < self.size:
+            self._values[(self._start + self.count) % self.size] = value
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self._m2 += delta * (value - self.mean)
+        else:
+            old = self._values[self._start]
+            self._values[self._start] = value
+            self._start = (self._start + 1) % self.size
+            self._swap(old, value)
+        self._tick()
+
+    def replace_last(self, value):
+        if not self.count:
+            return self.append(value)
+        index = (self._start + self.count - 1) % self.size
+        old = self._values[index]
+        self._values[index] = value
+        self._swap(old, value)
+        self._tick()
+
+    def _swap(self, old, new):
+        """Replace one value in the window by another, keeping the count."""
+        previous_mean = self.mean
+        self.mean += (new - old) / self.count
+        self._m2 += (new - old) * (new - self.mean + old - previous_mean)
+
+    def _tick(self):
+        self._updates += 1
+        if self._updates % RESYNC_EVERY == 0:
+            values = self.values()
+            self.mean = float(values.mean())
+            self._m2 = float(((values - self.mean) ** 2).sum())
+
+
+class IndicatorState:
+    """One ticker's stock-card indicators (moving averages, volatility, day change, recommendation),
+    kept current in constant time per new session or price tick.
+
+    Seeded once from a daily history; after that push() adds a completed session's close and
+    tick() moves the current session's price. snapshot() matches analyze_panel's numbers.
+    The poller and request threads share one state per ticker, so every method holds the
+    (reentrant) lock for its whole read-modify-write.
+    """
+
+    def __init__(self, short_window=SHORT_MA_WINDOW, long_window=LONG_MA_WINDOW,
+                 volatility_window=VOLATILITY_WINDOW):
+        self.short = RollingWindow(short_window)
+        self.long = RollingWindow(long_window)
+        self.returns = RollingWindow(volatility_window)
+        self.latest = None
+        self.previous = None  # close of the session before the current one
+        self.session = None  # date of the current session
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_history(cls, history):
+        """Seed from the tail of a daily history frame (only the bars the windows need are read)."""
+        state = cls()
+        state.sync(history)
+        return state
+
+    def push(self, price, session=None):
+        """Start a new session at `price`."""
+        with self._lock:
+            if self.latest is not None:
+                self.previous = self.latest
+                self.returns.append(price / self.previous - 1)
+            self.short.append(price)
+            self.long.append(price)
+            self.latest = price
+            self.session = session
+
+    def tick(self, price):
+        """Move the current session's price."""
+        with self._lock:
+            if self.latest is None:
+                self.latest = price
+                self.short.append(price)
+                self.long.append(price)
+                return
+            self.short.replace_last(price)
+            self.long.replace_last(price)
+            if self.previous is not None:
+                self.returns.replace_last(price / self.previous - 1)
+            self.latest = price
+
+    def update(self, price, session=None):
+        """tick() within the current session, push() when `session` is a later date."""
+        with self._lock:
+            if session is not None and (self.session is None or session > self.session):
+                self.push(price, session)
+            else:
+                self.tick(price)
+            return self.snapshot()
+
+    def refresh(self, history, price=None, session=None):
+        """sync() to `history`, then update() to `price` if given, and snapshot() - all atomically."""
+        with self._lock:
+            self.sync(history)
+            return self.snapshot() if price is None else self.update(price, session)
+
+    def sync(self, history):
+        """Push the bars of `history` newer than the current session, or tick to its last close.
+
+        Only the tail of the frame is read, so this stays O(new bars).
+        """
+        close = history["Close"].dropna() if not history.empty else history
+        if close.empty:
+            return
+        with self._lock:
+            if self.session is None:
+                new = close.iloc[-max(self.long.size, self.returns.size + 1):]
+            else:
+                n = 0
+                while n < len(close) and close.index[-1 - n].date() > self.session:
+                    n += 1
+                if n == 0:
+                    if close.index[-1].date() == self.session:
+                        self.tick(float(close.iloc[-1]))
+                    return
+                new = close.iloc[-n:]
+            for date, price in new.items():
+                self.push(float(price), date.date())
+
+    def snapshot(self):
+        with self._lock:
+            latest = self.latest
+            previous = self.previous if self.previous is not None else latest
+            short_ma = self.short.mean if self.short.full else math.nan
+            long_ma = self.long.mean if self.long.full else math.nan
+            volatility = math.sqrt(self.returns.variance()) * math.sqrt(TRADING_DAYS)
+        change = latest - previous
+        return {
+            "latest_price": latest,
+            "price_change": change,
+            "price_change_pct": change / previous * 100 if previous else 0.0,
+            "short_term_ma": short_ma,
+            "long_term_ma": long_ma,
+            "volatility": volatility,
+            "recommendation": str(recommend(latest, short_ma, long_ma)),
+        }
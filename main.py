@@ -1,39 +1,364 @@
-from flask import Flask, request, session, redirect, url_for
-import yfinance as yf
-from yahooquery import search
-from flask_session import Session  # For server-side session storage
-from pymongo import MongoClient
-from datetime import datetime
+import asyncio
+import copy
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+import click
+from flask import (Blueprint, Flask, Response, current_app, g, request, session, redirect, url_for, jsonify,
+                   make_response, render_template)
+from markupsafe import Markup
+from datetime import datetime, timedelta, timezone
+from metrics import CONTENT_TYPE, registry, request_seconds, server_timing, start_request, timed
+from sessions import HISTORY_LIMIT, add_to_history, configure_sessions
+from symbols import DEFAULT_SYMBOL_MASTER, NSE_EQUITY_LIST_URL, load_symbol_index, normalize_name, refresh_symbol_master
+from cache import SingleFlight, TTLCache
+from http_cache import configure_http_cache
+from scheduler import PrefetchScheduler
+from price_feed import PriceFeed
 
-app = Flask(__name__)
+# pandas, yfinance and pymongo are imported where they are first needed, not here: importing
+# this module and calling create_app() stays cheap, and works with no MongoDB running.
 
-# Configure session to use filesystem (server-side storage)
-app.config["SESSION_TYPE"] = "filesystem"
-app.config["SECRET_KEY"] = "your_secret_key_here"  # Replace with a secure key
-Session(app)
+# Defaults for create_app(). Each can be overridden by a FLASK_<NAME> environment variable,
+# parsed as JSON where possible (FLASK_PREFETCH_ENABLED=false, FLASK_MONGO_POOL__maxPoolSize=20),
+# and then by the mapping passed to create_app().
+DEFAULT_CONFIG = {
+    "SECRET_KEY": None,  # required with cookie sessions outside debug/testing (FLASK_SECRET_KEY)
+    # Session backend: "cookie" (signed cookie, default) or "mongodb" (server-side with TTL expiry)
+    "SESSION_BACKEND": "cookie",
+    "HISTORY_LIMIT": HISTORY_LIMIT,  # most recent company names kept per session
 
-# MongoDB connection
-client = MongoClient('mongodb://localhost:27017/')
-db = client['Mydatabase']  # Database name: Mydatabase
-collection = db['names']  # Collection name: names
+    # How long (seconds) a snapshot stored in `names` is served before Yahoo is asked again
+    "MARKET_DATA_MAX_AGE": 15 * 60,
 
+    # Local company-name -> ticker index; live yahooquery search is only the fallback for misses
+    "SYMBOL_MASTER": DEFAULT_SYMBOL_MASTER,
+
+    # Largest watchlist accepted by /api/batch in one request
+    "MAX_BATCH_SIZE": 100,
+
+    # Most holdings /api/portfolio accepts in one request
+    "MAX_PORTFOLIO_SIZE": 500,
+
+    # Largest amounts x years x returns grid accepted by /api/projection/grid
+    "MAX_GRID_CELLS": 100_000,
+    # Most Monte Carlo paths /api/projection/simulate will draw per request
+    "MAX_SIMULATION_PATHS": 50_000,
+
+    # Background refresh of the most-requested tickers (see start_prefetch)
+    "PREFETCH_ENABLED": True,
+    "PREFETCH_INTERVAL": 5 * 60,  # seconds; below HISTORY_TTL so hot tickers never go cold
+    "PREFETCH_TOP_N": 50,
+    "PREFETCH_MAX_WORKERS": 4,
+    "PREFETCH_RATE": 2.0,  # Yahoo requests per second started by the scheduler
+    "PREFETCH_HALF_LIFE": 60 * 60,  # seconds for a ticker's request count to halve
+
+    # Screener over every ticker in the symbol master (see start_screener)
+    "SCREENER_ENABLED": True,
+    "SCREENER_INTERVAL": 30 * 60,  # seconds between rebuilds during market hours
+    "SCREENER_BATCH_SIZE": 100,  # tickers per bulk history download
+    "SCREENER_INFO_RATE": 2.0,  # info fetches per second (info is cached for hours)
+    "SCREENER_MAX_RESULTS": 500,
+
+    # Live prices over Server-Sent Events: one shared poll per watched ticker, fanned out to viewers
+    "STREAM_INTERVAL": 5.0,  # seconds between polls during market hours
+    "STREAM_CLOSED_INTERVAL": 60.0,  # and outside them
+    "STREAM_HEARTBEAT": 15.0,  # seconds between keep-alive comments on an idle stream
+    "STREAM_QUEUE_SIZE": 8,  # events buffered per viewer before the oldest are dropped
+    "STREAM_MAX_SUBSCRIBERS": 1000,
+
+    # Coordinate Yahoo fetches across app workers with a lock document in MongoDB, so only one
+    # worker refreshes a stale ticker while the others wait for its snapshot
+    "FETCH_LOCK_ENABLED": False,
+    "FETCH_LOCK_TIMEOUT": 10,  # seconds before a lock is considered abandoned
+
+    # Prometheus metrics on /metrics; SERVER_TIMING adds per-stage durations to every response
+    "METRICS_ENABLED": True,
+    "SERVER_TIMING": False,
+
+    # MongoDB connection pool: bounded, with short timeouts so a slow or absent database fails
+    # fast instead of hanging request threads
+    "MONGO_URI": "mongodb://localhost:27017/",
+    "MONGO_DB": "Mydatabase",
+    "MONGO_POOL": {
+        "maxPoolSize": 50,
+        "minPoolSize": 0,
+        "maxIdleTimeMS": 60_000,
+        "waitQueueTimeoutMS": 2_000,
+        "serverSelectionTimeoutMS": 3_000,
+        "connectTimeoutMS": 2_000,
+        "socketTimeoutMS": 5_000,
+    },
+
+    # Daily bars are kept in MongoDB (price_history) so each refresh only downloads new sessions
+    "PRICE_STORE_ENABLED": True,
+
+    # Snapshot upserts are buffered and flushed to `names` with bulk_write off the request path
+    "WRITE_BUFFER_MAX_BATCH": 100,
+    "WRITE_BUFFER_FLUSH_INTERVAL": 2.0,  # seconds
+}
+
+bp = Blueprint("main", __name__, cli_group=None)
+
+# Concurrent requests in this process share one live name search per name
+search_flights = SingleFlight()
+
+_all_services = weakref.WeakSet()
+
+
+class Services:
+    """One app's MongoDB client, market-data layer and background workers, each built on first use.
+
+    Nothing here connects, starts a thread or imports pandas/yfinance/pymongo until a request
+    needs it, so a pre-fork server can create the app before forking without its workers
+    sharing sockets; a forked child also forgets anything its parent had built (see reset).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.config = app.config
+        # When each ticker's served snapshot was fetched; /stock/<ticker> derives its ETag from it
+        self.snapshot_versions = TTLCache(maxsize=4096, ttl=app.config["MARKET_DATA_MAX_AGE"])
+        self._etag_salt = None
+        self.reset()
+        _all_services.add(self)
+
+    def reset(self, *names):
+        """Drop the named clients and workers (all of them by default); the next use builds new ones."""
+        if not names:
+            self._lock = threading.RLock()
+            self._built = {}
+            self.indexes_ready = False
+        for name in names:
+            self._built.pop(name, None)
+
+    def peek(self, name):
+        """The named client or worker if it has been built, else None."""
+        return self._built.get(name)
+
+    def _get(self, name, build):
+        try:
+            return self._built[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._built:
+                self._built[name] = build()
+            return self._built[name]
+
+    @property
+    def etag_salt(self):
+        """Hash of the templates and static files: the same in every worker, new on every deploy
+        that changes how a page looks, so an old ETag never matches a new page."""
+        if self._etag_salt is None:
+            digest = hashlib.sha1()
+            for folder in (os.path.join(self.app.root_path, self.app.template_folder), self.app.static_folder):
+                for root, dirs, files in os.walk(folder):
+                    dirs.sort()
+                    for name in sorted(files):
+                        path = os.path.join(root, name)
+                        digest.update(os.path.relpath(path, folder).encode())
+                        with open(path, "rb") as f:
+                            digest.update(f.read())
+            self._etag_salt = digest.hexdigest()
+        return self._etag_salt
+
+    @property
+    def client(self):
+        return self._get("client", self._build_client)
+
+    def _build_client(self):
+        from pymongo import MongoClient
+        return MongoClient(self.config["MONGO_URI"], **self.config["MONGO_POOL"])
+
+    @property
+    def db(self):
+        return self._get("db", lambda: self.client[self.config["MONGO_DB"]])
+
+    @property
+    def collection(self):
+        return self._get("collection", lambda: self.db["names"])  # company snapshots
+
+    @property
+    def locks(self):
+        return self._get("locks", lambda: self.db["locks"])  # short-lived fetch locks shared by all workers
+
+    @property
+    def price_store(self):
+        """The PriceStore of daily bars, or None when PRICE_STORE_ENABLED is off."""
+        return self._get("price_store", self._build_price_store)
+
+    def _build_price_store(self):
+        if not self.config["PRICE_STORE_ENABLED"]:
+            return None
+        from price_store import PriceStore
+        return PriceStore(self.db)
+
+    @property
+    def market(self):
+        """The market_data module (yfinance, pandas), pointed at this app's price store."""
+        return self._get("market", self._load_market)
+
+    def _load_market(self):
+        import market_data
+        market_data.use_price_store(self.price_store)
+        return market_data
+
+    @property
+    def write_buffer(self):
+        return self._get("write_buffer", self._build_write_buffer)
+
+    def _build_write_buffer(self):
+        from write_buffer import WriteBehindBuffer
+        return WriteBehindBuffer(
+            self.collection,
+            max_batch=self.config["WRITE_BUFFER_MAX_BATCH"],
+            flush_interval=self.config["WRITE_BUFFER_FLUSH_INTERVAL"],
+            # Unchanged snapshots are still rewritten often enough to keep their timestamp fresh
+            rewrite_after=self.config["MARKET_DATA_MAX_AGE"] / 2,
+            logger=self.app.logger,
+        )
+
+    @property
+    def symbol_index(self):
+        return self._get("symbol_index", lambda: load_symbol_index(self.config["SYMBOL_MASTER"]))
+
+    @property
+    def background(self):
+        """Flushes a fetched ticker and releases its cross-worker lock off the request path."""
+        return self._get("background", lambda: ThreadPoolExecutor(max_workers=4, thread_name_prefix="mongo-write"))
+
+    @property
+    def prefetch(self):
+        return self._get("prefetch", self._build_prefetch)
+
+    def _build_prefetch(self):
+        def refresh(ticker):
+            with self.app.app_context():
+                refresh_ticker(ticker)
+
+        return PrefetchScheduler(
+            refresh,
+            interval=self.config["PREFETCH_INTERVAL"],
+            top_n=self.config["PREFETCH_TOP_N"],
+            max_workers=self.config["PREFETCH_MAX_WORKERS"],
+            rate=self.config["PREFETCH_RATE"],
+            half_life=self.config["PREFETCH_HALF_LIFE"],
+            logger=self.app.logger,
+        )
+
+    @property
+    def screener(self):
+        return self._get("screener", self._build_screener)
+
+    def _build_screener(self):
+        from screener import Screener
+        market = self.market
+        return Screener(
+            lambda: self.symbol_index.symbols(),
+            # Sweeps bypass the history cache so they never evict the tickers users are viewing
+            lambda tickers: market.close_panel(tickers, cache=False),
+            market.get_info,
+            interval=self.config["SCREENER_INTERVAL"],
+            batch_size=self.config["SCREENER_BATCH_SIZE"],
+            info_rate=self.config["SCREENER_INFO_RATE"],
+            logger=self.app.logger,
+        )
+
+    @property
+    def price_feed(self):
+        return self._get("price_feed", lambda: PriceFeed(
+            self.market.live_quote,
+            interval=self.config["STREAM_INTERVAL"],
+            closed_interval=self.config["STREAM_CLOSED_INTERVAL"],
+            queue_size=self.config["STREAM_QUEUE_SIZE"],
+            max_subscribers=self.config["STREAM_MAX_SUBSCRIBERS"],
+            logger=self.app.logger,
+        ))
+
+
+def _reset_after_fork():
+    # A MongoClient, its pool and every worker thread belong to the process that built them
+    for services in list(_all_services):
+        services.reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_services(app=None):
+    return (app or current_app).extensions["services"]
+
+
+def create_app(config=None):
+    """Build the app from DEFAULT_CONFIG, then FLASK_* environment variables, then `config`.
+
+    Cheap by design (see Services): it imports and starts with no MongoDB running, and a
+    pre-fork server can call it once in the parent, e.g. `gunicorn --preload "main:create_app()"`.
+    """
+    app = Flask(__name__)
+    app.config.from_mapping(copy.deepcopy(DEFAULT_CONFIG))
+    app.config.from_prefixed_env()
+    if config:
+        app.config.from_mapping(config)
+    services = app.extensions["services"] = Services(app)
+    configure_sessions(app, lambda: services.client)
+    # ETags, 304s, gzip/brotli and content-hashed static URLs (see http_cache.py)
+    configure_http_cache(app)
+    app.register_blueprint(bp)
+    return app
+
+
+def ensure_indexes():
+    """Create the `names` indexes on first use (not at startup, so startup never waits on MongoDB)."""
+    services = get_services()
+    if not services.indexes_ready:
+        services.collection.create_index("ticker", unique=True)
+        # Snapshots nobody has looked up for a week are dropped by MongoDB's TTL monitor
+        services.collection.create_index("timestamp", expireAfterSeconds=7 * 24 * 60 * 60)
+        services.locks.create_index("expires_at", expireAfterSeconds=0)
+        services.indexes_ready = True
+
+@timed("symbol_lookup")
 def get_ticker_symbol(company_name):
-    """Find the stock ticker symbol for a given company name from NSE/BSE only."""
+    """Find the stock ticker symbol for a given company name from NSE/BSE only.
+
+    Returns the symbol, "INVALID" for non-Indian listings, "UNAVAILABLE" while Yahoo is
+    degraded, or None when nothing was found.
+    """
+    symbol_index = get_services().symbol_index
+    symbol = symbol_index.lookup(company_name)
+    if symbol:
+        return symbol
+    if symbol_index.is_missing(company_name):
+        return "INVALID"
+    from upstream import UpstreamUnavailable, search
     try:
-        result = search(company_name)
+        result = search_flights.do(normalize_name(company_name), search, company_name)
         if "quotes" in result and result["quotes"]:
             for quote in result["quotes"]:
                 if quote["exchange"] in ["NSI", "BSE"]:
+                    symbol_index.learn(company_name, quote["symbol"])
                     return quote["symbol"]
+        symbol_index.mark_missing(company_name)
         return "INVALID"
+    except UpstreamUnavailable:
+        return "UNAVAILABLE"  # Yahoo is throttling or down; not the same as "not found"
     except Exception:
         return None
 
-def get_company_details(ticker):
-    """Fetch company details from Yahoo Finance with error handling."""
+def get_company_details(market):
+    """Build company details from the already-fetched info dict."""
+    if market is None:
+        return None
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        info = market.info
         if not info or "longName" not in info:
             return None
         details = {
@@ -56,109 +381,55 @@ def get_company_details(ticker):
     except Exception:
         return None
 
-def get_stock_data(ticker):
-    """Fetch live stock data with analysis and additional metrics."""
+@timed("analysis")
+def get_stock_data(market):
+    """Compute live stock data with analysis and additional metrics from the shared market data."""
+    if market is None:
+        return None
+    from analytics import analyze_history
     try:
-        stock = yf.Ticker(ticker)
-        stock_info = stock.history(period="1mo", interval="1d")
-        if stock_info.empty:
-            return None
-
-        latest_price = float(stock_info["Close"].iloc[-1])
-        previous_close = float(stock_info["Close"].iloc[-2]) if len(stock_info) > 1 else latest_price
-        price_change = latest_price - previous_close
-        price_change_pct = (price_change / previous_close) * 100 if previous_close != 0 else 0
-        high_price = float(stock_info["High"].max())
-        low_price = float(stock_info["Low"].min())
-        volume = int(stock_info["Volume"].iloc[-1])
-
-        daily_returns = stock_info["Close"].pct_change().dropna()
-        volatility = float(daily_returns.std() * (252 ** 0.5)) if not daily_returns.empty else "N/A"
-
-        short_term_ma = float(stock_info["Close"].rolling(window=20).mean().iloc[-1])
-        long_term_ma = float(stock_info["Close"].rolling(window=50).mean().iloc[-1])
-
-        if latest_price > short_term_ma > long_term_ma:
-            recommendation = "✅ Strong Buy"
-            advice = "Uptrend confirmed! Buying now may be profitable."
-        elif latest_price > short_term_ma:
-            recommendation = "⚠️ Hold"
-            advice = "Stock above short-term trend but below long-term average. Watch carefully."
-        else:
-            recommendation = "🚨 Sell"
-            advice = "Stock below both moving averages. Consider selling."
-
-        hist_data = stock.history(period="1y")
-        yearly_change = float(((latest_price - hist_data["Close"].iloc[0]) / hist_data["Close"].iloc[0]) * 100)
-
-        pe = stock.info.get("trailingPE", float('inf'))
-        div_yield = stock.info.get("dividendYield", 0)
-        health = "Strong" if pe < 20 and div_yield > 0.02 else "Moderate" if pe < 30 else "Weak"
-
-        return (latest_price, high_price, low_price, volume, recommendation, advice, yearly_change,
-                price_change, price_change_pct, volatility, health)
+        return analyze_history(market.history, market.info, latest_price=market.latest_price,
+                               state=get_services().market.indicator_state(market.ticker, market.history))
     except Exception:
         return None
 
 def calculate_investment_suggestion(amount, years, latest_price, company_details, recommendation, volatility):
     """Calculate investment suggestion with additional detailed metrics."""
+    from projections import project_investment
     try:
         amount = float(amount)
         years = int(years)
-        if amount <= 0:
-            return """
-            <div class='investment-box error-box'>
-                <h3>❌ Invalid Input</h3>
-                <p>Amount must be greater than ₹0. Please enter a positive value.</p>
-            </div>
-            """
-
-        num_shares = amount / latest_price
-        total_investment = amount
-        annual_return = company_details["Dividend Yield"] if company_details["Dividend Yield"] != "N/A" else 0.10
-        future_value = total_investment * (1 + annual_return) ** years
-
-        annualized_return = ((future_value / total_investment) ** (1 / years) - 1) * 100
-        cumulative_return = ((future_value - total_investment) / total_investment) * 100
-
-        annual_dividend_per_share = latest_price * annual_return
-        total_dividends = annual_dividend_per_share * num_shares * years
-
-        beta = company_details["Beta"] if isinstance(company_details["Beta"], (int, float)) else 1.0
-        risk_adjusted_return = annualized_return / beta if beta != 0 else annualized_return
-
-        vol_factor = volatility if isinstance(volatility, float) else 0.10
-        lower_bound = future_value * (1 - vol_factor)
-        upper_bound = future_value * (1 + vol_factor)
-
-        suggestion = f"""
-        <div class='investment-box'>
-            <h3>💡 Investment Projection</h3>
-            <p><strong>With ₹{amount:,.2f}</strong> invested in <strong>{company_details['Name']}</strong> for <strong>{years} years</strong>:</p>
-            <p>📊 Shares: <strong>{num_shares:.2f}</strong> at ₹{latest_price:.2f} each</p>
-            <p>💰 Initial Investment: <strong>₹{total_investment:,.2f}</strong></p>
-            <p>📈 Projected Value: <strong>₹{future_value:,.2f}</strong> ({annual_return * 100:.1f}% annual return)</p>
-            <p>📅 Annualized Return: <strong>{annualized_return:.2f}%</strong></p>
-            <p>🌟 Cumulative Return: <strong>{cumulative_return:.2f}%</strong></p>
-            <p>💵 Total Dividends Earned: <strong>₹{total_dividends:,.2f}</strong> (assuming constant yield)</p>
-            <p>🛡️ Risk-Adjusted Return: <strong>{risk_adjusted_return:.2f}%</strong> (adjusted by Beta: {beta})</p>
-            <p>📉 Value Range (Volatility ±{vol_factor * 100:.1f}%): <strong>₹{lower_bound:,.2f} - ₹{upper_bound:,.2f}</strong></p>
-        """
-        if num_shares < 1:
-            suggestion += "<p class='warning'>⚠️ Note: Less than 1 share. Fractional shares may not be tradable on all platforms.</p>"
-        if recommendation == "✅ Strong Buy":
-            suggestion += "<p class='success'>✅ Great opportunity based on current trends!</p>"
-        elif recommendation == "⚠️ Hold":
-            suggestion += "<p class='warning'>⚠️ Monitor closely or diversify.</p>"
-        else:
-            suggestion += "<p class='danger'>🚨 Consider alternatives.</p>"
-        suggestion += "<p class='note'>⚠️ Note: Projections assume stable conditions and constant dividend yield.</p></div>"
-        return suggestion
+        if not math.isfinite(amount) or amount <= 0:
+            return _render_investment(error={
+                "title": "Invalid Input",
+                "message": "Amount must be greater than ₹0. Please enter a positive value.",
+            })
+        if not 1 <= years <= 50:
+            return _render_investment(error={
+                "title": "Invalid Input",
+                "message": "Years must be between 1 and 50.",
+            })
+
+        projection = project_investment(amount, years, latest_price, company_details, volatility)
+        return _render_investment(name=company_details["Name"], recommendation=recommendation, **projection)
     except ValueError:
-        return "<div class='investment-box error-box'><h3>❌ Error</h3><p>Please enter valid numbers for amount and years.</p></div>"
+        return _render_investment(error={
+            "title": "Error",
+            "message": "Please enter valid numbers for amount and years.",
+        })
+
+def _render_investment(**context):
+    """Render the investment projection box; returns Markup so the stock card can embed it as-is."""
+    return Markup(render_template("_investment.html", **context))
 
+@bp.app_template_filter("thousands")
+def thousands(value):
+    """Format a number with thousands separators, passing placeholders like "N/A" through."""
+    return f"{value:,}" if isinstance(value, (int, float)) else value
+
+@timed("store")
 def store_company_data(ticker, company_details, stock_data):
-    """Store company data in MongoDB."""
+    """Store company data in MongoDB (buffered; see write_buffer)."""
     if company_details and stock_data:
         (latest_price, high_price, low_price, volume, recommendation, advice, yearly_change,
          price_change, price_change_pct, volatility, health) = stock_data
@@ -183,25 +454,163 @@ def store_company_data(ticker, company_details, stock_data):
             "timestamp": datetime.utcnow()  # Store the time of data fetch
         }
 
-        # Update or insert the document (upsert=True ensures it updates if exists, inserts if not)
-        collection.update_one(
-            {"ticker": ticker.upper()},
-            {"$set": data},
-            upsert=True
+        # Queue an upsert; the write buffer flushes it with the next bulk_write
+        services = get_services()
+        services.write_buffer.upsert(ticker.upper(), {"ticker": ticker.upper()}, data)
+        services.snapshot_versions.set(ticker.upper(), data["timestamp"])
+
+@timed("mongo_read")
+def load_company_data(ticker, max_age=None):
+    """Read a ticker's stored snapshot back from MongoDB if it is fresher than `max_age` seconds.
+
+    Returns (company_details, stock_data) or None when there is no fresh snapshot.
+    """
+    from analytics import StockData
+    from pymongo.errors import PyMongoError
+
+    services = get_services()
+    if max_age is None:
+        max_age = current_app.config["MARKET_DATA_MAX_AGE"]
+    try:
+        ensure_indexes()
+        doc = services.collection.find_one({
+            "ticker": ticker.upper(),
+            "timestamp": {"$gte": datetime.utcnow() - timedelta(seconds=max_age)},
+        })
+    except PyMongoError:
+        return None
+    if not doc:
+        return None
+    services.snapshot_versions.set(ticker.upper(), doc["timestamp"])
+    stock_data = StockData(**{field: doc["stock_data"][field] for field in StockData._fields})
+    return doc["company_details"], stock_data
+
+def refresh_ticker(ticker):
+    """Re-download a ticker and store the new snapshot; run by the prefetch scheduler."""
+    market = get_services().market.refresh_market_data(ticker)
+    if market.history.empty:
+        return
+    store_company_data(ticker, get_company_details(market), get_stock_data(market))
+
+def start_prefetch():
+    """Start the prefetch scheduler on first use, seeded with the tickers most recently stored in MongoDB."""
+    from pymongo.errors import PyMongoError
+
+    services = get_services()
+    prefetch = services.prefetch
+    if prefetch.running or not current_app.config["PREFETCH_ENABLED"]:
+        return
+    try:
+        recent = services.collection.find({}, {"ticker": 1}).sort("timestamp", -1)
+        prefetch.seed(doc["ticker"] for doc in recent.limit(current_app.config["PREFETCH_TOP_N"]))
+    except PyMongoError:
+        pass
+    prefetch.start()
+
+def start_screener():
+    """Start building the screener table on first use."""
+    screener = get_services().screener
+    if current_app.config["SCREENER_ENABLED"] and not screener.running:
+        screener.start()
+
+def track_request(ticker):
+    """Count a successful user lookup towards the scheduler's hot-ticker ranking."""
+    if current_app.config["PREFETCH_ENABLED"]:
+        start_prefetch()
+        get_services().prefetch.record(ticker)
+
+def acquire_fetch_lock(ticker):
+    """Try to take the cross-worker fetch lock for a ticker; stale locks from dead workers are taken over."""
+    from pymongo.errors import DuplicateKeyError, PyMongoError
+
+    locks = get_services().locks
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=current_app.config["FETCH_LOCK_TIMEOUT"])
+    try:
+        locks.insert_one({"_id": f"fetch:{ticker.upper()}", "expires_at": expires_at})
+        return True
+    except DuplicateKeyError:
+        taken = locks.find_one_and_update(
+            {"_id": f"fetch:{ticker.upper()}", "expires_at": {"$lt": now}},
+            {"$set": {"expires_at": expires_at}},
         )
+        return taken is not None
+    except PyMongoError:
+        return False
+
+def release_fetch_lock(ticker):
+    from pymongo.errors import PyMongoError
+
+    try:
+        get_services().locks.delete_one({"_id": f"fetch:{ticker.upper()}"})
+    except PyMongoError:
+        pass
 
-@app.route("/", methods=["GET", "POST"])
-def index():
+def wait_for_snapshot(ticker):
+    """Poll MongoDB for the snapshot another worker is fetching; None if it does not appear in time."""
+    deadline = time.monotonic() + current_app.config["FETCH_LOCK_TIMEOUT"]
+    while time.monotonic() < deadline:
+        time.sleep(0.2)
+        cached = load_company_data(ticker)
+        if cached:
+            return cached
+    return None
+
+def _flush_and_release(ticker):
+    """Write the fetched snapshot now so workers waiting on the fetch lock can read it, then unlock."""
+    try:
+        get_services().write_buffer.flush()
+    finally:
+        release_fetch_lock(ticker)
+
+async def get_analysis_async(ticker):
+    """Return (company_details, stock_data) for a ticker, serving MongoDB's copy while it is fresh.
+
+    On a miss, history and info download concurrently (shared with any other request for the
+    same ticker) and the MongoDB write is fire-and-forget. Only tickers that turn out to exist
+    count towards the prefetch ranking.
+    """
+    if not ticker or ticker in ("INVALID", "UNAVAILABLE"):
+        return None, None
+    company_details, stock_data = await _fetch_analysis(ticker)
+    if company_details and stock_data:
+        track_request(ticker)
+    return company_details, stock_data
+
+async def _fetch_analysis(ticker):
+    cached = await asyncio.to_thread(load_company_data, ticker)
+    if cached:
+        return cached
+
+    locked = False
+    if current_app.config["FETCH_LOCK_ENABLED"]:
+        locked = await asyncio.to_thread(acquire_fetch_lock, ticker)
+        if not locked:
+            cached = await asyncio.to_thread(wait_for_snapshot, ticker)
+            if cached:
+                return cached
+
+    try:
+        market = await get_services().market.fetch_market_data_async(ticker)
+    except Exception:
+        market = None
+    if market is not None and market.history.empty:
+        market = None
+    company_details = get_company_details(market)
+    stock_data = get_stock_data(market)
+    store_company_data(ticker, company_details, stock_data)
+    if locked:
+        get_services().background.submit(copy_context().run, _flush_and_release, ticker)
+    return company_details, stock_data
+
+@bp.route("/", methods=["GET", "POST"])
+async def index():
     # Initialize session history if not already present
     if "history" not in session:
         session["history"] = []
 
-    stock_details = """
-    <div class='welcome'>
-        <h1>📈 Live Stock Advisor</h1>
-        <p>Enter an Indian company name to analyze its stock performance.</p>
-    </div>
-    """
+    error = None
+    card = None
 
     # Get company_name from query parameter (if coming from history)
     prefilled_company = request.args.get("company_name", "")
@@ -210,292 +619,463 @@ def index():
         company_name = request.form.get("company_name", "").strip()
 
         if company_name:
-            ticker = get_ticker_symbol(company_name)
-            if ticker and ticker != "INVALID" and ticker is not None:
-                # Add to history only if valid ticker and not already the last entry
+            ticker = await asyncio.to_thread(get_ticker_symbol, company_name)
+            if ticker and ticker not in ("INVALID", "UNAVAILABLE"):
+                # Add to history only if valid ticker; repeats move to the end instead of piling up
                 if not session["history"] or session["history"][-1] != company_name:
-                    session["history"].append(company_name)
-                    session.modified = True  # Ensure session updates
+                    session["history"] = add_to_history(session["history"], company_name,
+                                                        current_app.config["HISTORY_LIMIT"])
 
             if "amount" not in request.form:  # Initial lookup
                 if not company_name:
-                    stock_details = "<p class='error'>❌ Please enter a company name.</p>"
+                    error = "Please enter a company name."
+                elif ticker == "INVALID":
+                    error = "Only Indian stocks (NSE/BSE) are supported."
+                elif ticker == "UNAVAILABLE":
+                    error = "Stock data provider is busy. Please try again in a moment."
+                elif ticker is None:
+                    error = "Stock not found. Try another name."
                 else:
-                    if ticker == "INVALID":
-                        stock_details = "<p class='error'>❌ Only Indian stocks (NSE/BSE) are supported.</p>"
-                    elif ticker is None:
-                        stock_details = "<p class='error'>❌ Stock not found. Try another name.</p>"
+                    company_details, stock_data = await get_analysis_async(ticker)
+                    if not stock_data or not company_details:
+                        error = "Unable to fetch stock data."
                     else:
-                        stock_data = get_stock_data(ticker)
-                        company_details = get_company_details(ticker)
-
-                        if not stock_data or not company_details:
-                            stock_details = "<p class='error'>❌ Unable to fetch stock data.</p>"
-                        else:
-                            # Store data in MongoDB
-                            store_company_data(ticker, company_details, stock_data)
-
-                            (latest_price, high_price, low_price, volume, recommendation, advice, yearly_change,
-                             price_change, price_change_pct, volatility, health) = stock_data
-                            stock_details = f"""
-                            <div class='stock-card'>
-                                <h2>{company_details['Name']} ({ticker.upper()})</h2>
-                                <p class='price'><strong>Live Price:</strong> <span>₹{latest_price:.2f}</span></p>
-                                <div class='stats'>
-                                    <p>🔼 <strong>High:</strong> ₹{high_price:.2f}</p>
-                                    <p>🔽 <strong>Low:</strong> ₹{low_price:.2f}</p>
-                                    <p>📊 <strong>Volume:</strong> {volume:,}</p>
-                                    <p>📉 <strong>Avg Volume (3M):</strong> {company_details['Avg Volume']:,}</p>
-                                    <p>💰 <strong>Market Cap:</strong> ₹{company_details['Market Cap']:,}</p>
-                                    <p>📈 <strong>P/E Ratio:</strong> {company_details['P/E Ratio']}</p>
-                                    <p>📊 <strong>EPS:</strong> {company_details['EPS']}</p>
-                                    <p>💵 <strong>Dividend Yield:</strong> {company_details['Dividend Yield']}</p>
-                                    <p>📅 <strong>52W High:</strong> ₹{company_details['52W High']}</p>
-                                    <p>📅 <strong>52W Low:</strong> ₹{company_details['52W Low']}</p>
-                                    <p>📈 <strong>1Y Change:</strong> {yearly_change:.2f}%</p>
-                                    <p>📊 <strong>Price Change (Day):</strong> ₹{price_change:.2f} ({price_change_pct:.2f}%)</p>
-                                    <p>⚡ <strong>Volatility (Annual):</strong> {f'{volatility:.2f}' if isinstance(volatility, float) else volatility}</p>
-                                    <p>🛡️ <strong>Beta:</strong> {company_details['Beta']}</p>
-                                    <p>💪 <strong>Financial Health:</strong> {health} (Mock)</p>
-                                </div>
-                                <div class='recommendation'>
-                                    <h3>📢 Recommendation: {recommendation}</h3>
-                                    <p><strong>Advice:</strong> {advice}</p>
-                                </div>
-                                <div class='analyst-ratings'>
-                                    <h3>⭐ Analyst Ratings (Mock)</h3>
-                                    <p>Buy: <strong>65%</strong> | Hold: <strong>25%</strong> | Sell: <strong>10%</strong></p>
-                                </div>
-                                <div class='company-info'>
-                                    <h3>🏢 About {company_details['Name']}</h3>
-                                    <p><strong>Sector:</strong> {company_details['Sector']}</p>
-                                    <p><strong>Industry:</strong> {company_details['Industry']}</p>
-                                    <p><strong>CEO:</strong> {company_details['CEO']}</p>
-                                    <p><strong>Website:</strong> <a href='{company_details['Website']}' target='_blank'>{company_details['Website']}</a></p>
-                                    <p><strong>Summary:</strong> {company_details['Description'][:600]}...</p>
-                                </div>
-                                <div class='investment-form'>
-                                    <h3>💰 Calculate Investment</h3>
-                                    <form method='post'>
-                                        <input type='hidden' name='company_name' value='{company_name}'>
-                                        <input type='number' name='amount' placeholder='Enter Amount (₹)' min='0.01' step='0.01' required>
-                                        <input type='number' name='years' placeholder='Years' min='1' max='50' required>
-                                        <button type='submit'>Get Suggestion</button>
-                                    </form>
-                                </div>
-                            </div>
-                            """
+                        card = {"ticker": ticker, "company_name": company_name,
+                                "details": company_details, "stock": stock_data}
 
             elif "amount" in request.form and "years" in request.form:  # Investment calculation
                 amount = request.form.get("amount")
                 years = request.form.get("years")
-                stock_data = get_stock_data(ticker)
-                company_details = get_company_details(ticker)
+                company_details, stock_data = await get_analysis_async(ticker)
 
                 if not stock_data or not company_details:
-                    stock_details = "<p class='error'>❌ Unable to fetch stock data.</p>"
+                    error = "Unable to fetch stock data."
                 else:
-                    # Store data in MongoDB
-                    store_company_data(ticker, company_details, stock_data)
-
-                    (latest_price, high_price, low_price, volume, recommendation, advice, yearly_change,
-                     price_change, price_change_pct, volatility, health) = stock_data
-                    stock_details = f"""
-                    <div class='stock-card'>
-                        <h2>{company_details['Name']} ({ticker.upper()})</h2>
-                        <p class='price'><strong>Live Price:</strong> <span>₹{latest_price:.2f}</span></p>
-                        <div class='stats'>
-                            <p>🔼 <strong>High:</strong> ₹{high_price:.2f}</p>
-                            <p>🔽 <strong>Low:</strong> ₹{low_price:.2f}</p>
-                            <p>📊 <strong>Volume:</strong> {volume:,}</p>
-                            <p>📉 <strong>Avg Volume (3M):</strong> {company_details['Avg Volume']:,}</p>
-                            <p>💰 <strong>Market Cap:</strong> ₹{company_details['Market Cap']:,}</p>
-                            <p>📈 <strong>P/E Ratio:</strong> {company_details['P/E Ratio']}</p>
-                            <p>📊 <strong>EPS:</strong> {company_details['EPS']}</p>
-                            <p>💵 <strong>Dividend Yield:</strong> {company_details['Dividend Yield']}</p>
-                            <p>📅 <strong>52W High:</strong> ₹{company_details['52W High']}</p>
-                            <p>📅 <strong>52W Low:</strong> ₹{company_details['52W Low']}</p>
-                            <p>📈 <strong>1Y Change:</strong> {yearly_change:.2f}%</p>
-                            <p>📊 <strong>Price Change (Day):</strong> ₹{price_change:.2f} ({price_change_pct:.2f}%)</p>
-                            <p>⚡ <strong>Volatility (Annual):</strong> {f'{volatility:.2f}' if isinstance(volatility, float) else volatility}</p>
-                            <p>🛡️ <strong>Beta:</strong> {company_details['Beta']}</p>
-                            <p>💪 <strong>Financial Health:</strong> {health} (Mock)</p>
-                        </div>
-                        <div class='recommendation'>
-                            <h3>📢 Recommendation: {recommendation}</h3>
-                            <p><strong>Advice:</strong> {advice}</p>
-                        </div>
-                        <div class='analyst-ratings'>
-                            <h3>⭐ Analyst Ratings (Mock)</h3>
-                            <p>Buy: <strong>65%</strong> | Hold: <strong>25%</strong> | Sell: <strong>10%</strong></p>
-                        </div>
-                        <div class='company-info'>
-                            <h3>🏢 About {company_details['Name']}</h3>
-                            <p><strong>Sector:</strong> {company_details['Sector']}</p>
-                            <p><strong>Industry:</strong> {company_details['Industry']}</p>
-                            <p><strong>CEO:</strong> {company_details['CEO']}</p>
-                            <p><strong>Website:</strong> <a href='{company_details['Website']}' target='_blank'>{company_details['Website']}</a></p>
-                            <p><strong>Summary:</strong> {company_details['Description'][:600]}...</p>
-                        </div>
-                        {calculate_investment_suggestion(amount, years, latest_price, company_details, recommendation, volatility)}
-                        <div class='investment-form'>
-                            <h3>💰 Recalculate Investment</h3>
-                            <form method='post'>
-                                <input type='hidden' name='company_name' value='{company_name}'>
-                                <input type='number' name='amount' placeholder='Enter Amount (₹)' min='0.01' step='0.01' required>
-                                <input type='number' name='years' placeholder='Years' min='1' max='50' required>
-                                <button type='submit'>Update Suggestion</button>
-                            </form>
-                        </div>
-                    </div>
-                    """
-
-    return f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Live Stock Advisor</title>
-        <style>
-            body {{
-                font-family: 'Segoe UI', Arial, sans-serif;
-                background: url('/static/kl.webp') no-repeat center center fixed;
-                background-size: cover;
-                color: #fff;
-                margin: 0;
-                padding: 0;
-                display: flex;
-                justify-content: center;
-                align-items: center;
-                min-height: 100vh;
-            }}
-            .container {{
-                background: rgba(0, 0, 0, 0.85);
-                padding: 30px;
-                border-radius: 15px;
-                max-width: 800px;
-                box-shadow: 0 0 20px rgba(255, 255, 255, 0.3);
-                overflow-y: auto;
-                max-height: 85vh;
-            }}
-            h1, h2, h3 {{
-                color: #00e676;
-                text-shadow: 1px 1px 5px rgba(0, 0, 0, 0.5);
-            }}
-            input, button, .toggle-button {{
-                padding: 12px 20px;
-                font-size: 16px;
-                border-radius: 8px;
-                border: none;
-                margin: 10px;
-                transition: all 0.3s;
-            }}
-            input {{
-                background: rgba(255, 255, 255, 0.9);
-                width: 200px;
-            }}
-            button, .toggle-button {{
-                background: #00e676;
-                color: #fff;
-                font-weight: bold;
-                cursor: pointer;
-                text-decoration: none;
-                display: inline-block;
-            }}
-            button:hover, .toggle-button:hover {{
-                background: #00c853;
-                transform: scale(1.05);
-            }}
-            .stock-card {{
-                background: rgba(50, 50, 50, 0.9);
-                padding: 25px;
-                border-radius: 12px;
-                margin-top: 30px;
-            }}
-            .price span {{
-                font-size: 28px;
-                color: #00e676;
-                font-weight: bold;
-            }}
-            .stats p, .company-info p {{
-                margin: 8px 0;
-            }}
-            .recommendation, .analyst-ratings, .investment-form {{
-                margin: 20px 0;
-                padding: 15px;
-                background: rgba(255, 255, 255, 0.1);
-                border-radius: 8px;
-            }}
-            .investment-box {{
-                margin-top: 20px;
-                padding: 15px;
-                background: rgba(0, 255, 123, 0.1);
-                border-radius: 8px;
-            }}
-            .error-box {{
-                background: rgba(255, 82, 82, 0.2);
-            }}
-            .error, .danger {{
-                color: #ff5252;
-                font-weight: bold;
-            }}
-            .success {{
-                color: #00e676;
-                font-weight: bold;
-            }}
-            .warning {{
-                color: #ffca28;
-                font-weight: bold;
-            }}
-            .note {{
-                font-size: 12px;
-                color: #b0bec5;
-            }}
-            .welcome {{
-                text-align: center;
-            }}
-            .toggle-bar {{
-                text-align: center;
-                margin-top: 20px;
-            }}
-            ::-webkit-scrollbar {{
-                width: 10px;
-            }}
-            ::-webkit-scrollbar-thumb {{
-                background: #00e676;
-                border-radius: 5px;
-            }}
-            ::-webkit-scrollbar-track {{
-                background: rgba(255, 255, 255, 0.1);
-            }}
-        </style>
-        <script>
-            window.onload = function() {{
-                var companyName = "{prefilled_company}";
-                if (companyName) {{
-                    document.querySelector('input[name="company_name"]').value = companyName;
-                }}
-            }};
-        </script>
-    </head>
-    <body>
-        <div class="container">
-            <form method="post">
-                <h1>📊 Live Stock Advisor (India)</h1>
-                <input type="text" name="company_name" placeholder="Enter Company Name" required>
-                <button type="submit">Analyze Stock</button>
-            </form>
-            {stock_details}
-            <div class="toggle-bar">
-                <a href="{url_for('history')}" class="toggle-button">Show History</a>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+                    investment = calculate_investment_suggestion(
+                        amount, years, stock_data.latest_price, company_details,
+                        stock_data.recommendation, stock_data.volatility)
+                    card = {"ticker": ticker, "company_name": company_name,
+                            "details": company_details, "stock": stock_data, "investment": investment}
+
+    with timed("render"):
+        return render_template("index.html", prefilled_company=prefilled_company, error=error, card=card)
+
+@bp.before_app_request
+def _start_timer():
+    g.started_at = time.perf_counter()
+    start_request()
+
+@bp.after_app_request
+def _record_timing(response):
+    """Observe the request latency and, if enabled, report the stage timings in Server-Timing."""
+    elapsed = time.perf_counter() - g.get("started_at", time.perf_counter())
+    request_seconds.observe(elapsed, endpoint=request.endpoint or "unknown", method=request.method,
+                            status=response.status_code)
+    if current_app.config["SERVER_TIMING"]:
+        stages = server_timing()
+        total = f"total;dur={elapsed * 1000:.1f}"
+        response.headers["Server-Timing"] = f"{stages}, {total}" if stages else total
+    return response
+
+@registry.collector
+def _collect_stats():
+    """Expose the counters the caches, Yahoo client and write buffer already keep, once they exist."""
+    services = get_services()
+    market_data = services.peek("market")
+    if market_data is not None:
+        import upstream
+
+        caches = market_data.cache_stats()
+        yield ("cache_hits_total", "counter", "Market-data cache hits.",
+               [({"cache": name}, stats["hits"]) for name, stats in caches.items()])
+        yield ("cache_misses_total", "counter", "Market-data cache misses.",
+               [({"cache": name}, stats["misses"]) for name, stats in caches.items()])
+        yield ("cache_hit_ratio", "gauge", "Market-data cache hit ratio since start.",
+               [({"cache": name}, stats["hit_ratio"]) for name, stats in caches.items()])
+        yield ("cache_entries", "gauge", "Entries held by each market-data cache.",
+               [({"cache": name}, stats["size"]) for name, stats in caches.items()])
+        yield ("upstream_events_total", "counter", "Yahoo throttles, errors, retries and circuit-open rejections.",
+               [({"event": event}, upstream.events[event]) for event in ("throttled", "error", "retry", "circuit_open")])
+        yield ("upstream_circuit_open", "gauge", "1 while the Yahoo circuit breaker is open.",
+               [({}, int(upstream.yahoo_breaker.open))])
+        yield ("singleflight_shared_total", "counter", "Calls that shared another caller's in-flight fetch.",
+               [({"group": "market_data"}, market_data.flights.shared), ({"group": "search"}, search_flights.shared)])
+    write_buffer = services.peek("write_buffer")
+    if write_buffer is not None:
+        yield ("write_buffer_flushed_total", "counter", "Snapshot upserts written to MongoDB.",
+               [({}, write_buffer.flushed)])
+        yield ("write_buffer_skipped_total", "counter", "Snapshot upserts skipped as unchanged.",
+               [({}, write_buffer.skipped)])
+        yield ("write_buffer_pending", "gauge", "Snapshot upserts waiting for the next flush.",
+               [({}, write_buffer.pending())])
+    screener = services.peek("screener")
+    yield ("screener_tickers", "gauge", "Tickers in the screener table.", [({}, len(screener) if screener else 0)])
+    price_feed = services.peek("price_feed")
+    if price_feed is not None:
+        yield ("stream_subscribers", "gauge", "Open live-price streams.", [({}, price_feed.subscriber_count())])
+        yield ("stream_tickers", "gauge", "Distinct tickers polled for live prices.", [({}, len(price_feed.tickers()))])
+        yield ("stream_polls_total", "counter", "Live-price upstream polls.", [({}, price_feed.polls)])
+        yield ("stream_events_total", "counter", "Live-price events delivered to viewers.", [({}, price_feed.published)])
+        yield ("stream_dropped_total", "counter", "Live-price events slow viewers skipped.", [({}, price_feed.dropped())])
+
+@bp.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint."""
+    if not current_app.config["METRICS_ENABLED"]:
+        return Response("Not Found", status=404)
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+def snapshot_etag(ticker, version):
+    # MongoDB keeps milliseconds, so a snapshot reloaded from it must hash like the one just stored
+    version = version.replace(microsecond=version.microsecond // 1000 * 1000)
+    return hashlib.sha1(f"{ticker}:{version.isoformat()}:{get_services().etag_salt}".encode()).hexdigest()
+
+def _not_modified(ticker):
+    """A 304 for /stock/<ticker> when the client already has the page for the current snapshot, else None."""
+    version = get_services().snapshot_versions.get(ticker)
+    if version is None or not request.if_none_match.contains_weak(snapshot_etag(ticker, version)):
+        return None
+    response = Response(status=304)
+    response.set_etag(snapshot_etag(ticker, version))
+    response.last_modified = version.replace(tzinfo=timezone.utc)
+    return response
+
+@bp.route("/stock/<ticker>")
+async def stock(ticker):
+    """A ticker's stock card at its own URL; repeat views of an unchanged snapshot get 304 without re-rendering."""
+    ticker = ticker.strip().upper()
+    not_modified = _not_modified(ticker)
+    if not_modified is not None:
+        return not_modified
+    company_details, stock_data = await get_analysis_async(ticker)
+    if not stock_data or not company_details:
+        return render_template("index.html", prefilled_company="", error="Unable to fetch stock data.", card=None), 404
+
+    card = {"ticker": ticker, "company_name": ticker, "details": company_details, "stock": stock_data}
+    with timed("render"):
+        response = make_response(render_template("index.html", prefilled_company="", error=None, card=card))
+    version = get_services().snapshot_versions.get(ticker)
+    if version is not None:
+        response.set_etag(snapshot_etag(ticker, version))
+        response.last_modified = version.replace(tzinfo=timezone.utc)
+    return response
+
+def resolve_tickers(names):
+    """Resolve many company names at once: local index first, concurrent live searches for the rest."""
+    symbol_index = get_services().symbol_index
+    symbols = {name: symbol_index.lookup(name) for name in names}
+    misses = [name for name, symbol in symbols.items() if not symbol]
+    if misses:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            # Each search runs in a copy of this request's context, so it can reach the app
+            lookups = [pool.submit(copy_context().run, get_ticker_symbol, name) for name in misses]
+            symbols.update(zip(misses, (lookup.result() for lookup in lookups)))
+    return symbols
+
+def _json_object():
+    """The request's JSON body when it is an object, {} when there is none, None for any other JSON."""
+    payload = request.get_json(silent=True)
+    if not payload:
+        return {}
+    return payload if isinstance(payload, dict) else None
+
+def _params():
+    """Parameters from a JSON object body, else from the form/query string; None for non-object JSON."""
+    payload = _json_object()
+    return (payload or request.values) if payload is not None else None
+
+@bp.route("/api/batch", methods=["POST"])
+def batch():
+    """Analyze a watchlist in one request: {"companies": [...]} and/or {"tickers": [...]}."""
+    payload = _json_object()
+    if payload is None or not all(isinstance(payload.get(key, []), list) for key in ("companies", "tickers")):
+        return jsonify({"error": "Provide a JSON object with lists of companies and/or tickers."}), 400
+    names = payload.get("companies", []) + payload.get("tickers", [])
+    if not all(isinstance(name, str) for name in names):
+        return jsonify({"error": "Companies and tickers must be strings."}), 400
+    companies = [name.strip() for name in payload.get("companies", []) if name.strip()]
+    tickers = [ticker.strip().upper() for ticker in payload.get("tickers", []) if ticker.strip()]
+    if not companies and not tickers:
+        return jsonify({"error": "Provide a list of companies or tickers."}), 400
+    if len(companies) + len(tickers) > current_app.config["MAX_BATCH_SIZE"]:
+        return jsonify({"error": f"At most {current_app.config['MAX_BATCH_SIZE']} names per request."}), 400
+
+    resolved = resolve_tickers(companies)
+    unresolved = [name for name, symbol in resolved.items() if not symbol or symbol in ("INVALID", "UNAVAILABLE")]
+    tickers = list(dict.fromkeys(tickers + [s for s in resolved.values()
+                                            if s and s not in ("INVALID", "UNAVAILABLE")]))
+
+    from analytics import analyze_panel
+
+    try:
+        panel = get_services().market.close_panel(tickers)
+    except Exception:
+        return jsonify({"error": "Unable to fetch stock data."}), 502
+    missing = [ticker for ticker in tickers if ticker not in panel.columns]
+    table = analyze_panel(panel).round(4) if not panel.empty else None
+
+    return jsonify({
+        "columns": ["ticker"] + (list(table.columns) if table is not None else []),
+        "rows": [] if table is None else [
+            [ticker] + [None if value != value else value for value in row]  # NaN -> null
+            for ticker, row in zip(table.index, table.itertuples(index=False))
+        ],
+        "unresolved": unresolved + missing,
+    })
+
+@bp.route("/api/screener")
+def screen():
+    """Filter and sort the precomputed universe, e.g. ?where=pe<20 and dividend_yield>2&sort=yearly_change."""
+    if not current_app.config["SCREENER_ENABLED"]:
+        return jsonify({"error": "The screener is disabled."}), 404
+    from screener import COLUMNS as SCREENER_COLUMNS, parse_filters
 
-@app.route("/history", methods=["GET", "POST"])
+    start_screener()
+    screener = get_services().screener
+    sort = request.args.get("sort") or None
+    if sort is not None and sort not in SCREENER_COLUMNS:
+        return jsonify({"error": f"Cannot sort by {sort!r}."}), 400
+    try:
+        filters = [f for where in request.args.getlist("where") for f in parse_filters(where)]
+        limit = int(request.args.get("limit", 50))
+        if limit < 1:
+            raise ValueError("limit must be at least 1.")
+        limit = min(limit, current_app.config["SCREENER_MAX_RESULTS"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    matches, total = screener.query(filters, sort=sort, descending=request.args.get("order", "desc") != "asc",
+                                    limit=limit)
+    return jsonify({
+        "columns": ["ticker"] + list(matches.columns),
+        "rows": [
+            [ticker] + [None if value != value else value for value in row]  # NaN -> null
+            for ticker, row in zip(matches.index, matches.itertuples(index=False))
+        ],
+        "matched": total,
+        "universe": len(screener),
+        "updated_at": screener.updated_at.isoformat() if screener.updated_at else None,
+        "refreshing": screener.refreshing,
+    })
+
+def _sse(event, name="price"):
+    return f"event: {name}\ndata: {json.dumps(event)}\n\n"
+
+@bp.route("/api/stream/<ticker>")
+def stream(ticker):
+    """Server-Sent Events stream of a ticker's live price and day change."""
+    ticker = ticker.strip().upper()
+    services = get_services()
+    price_feed = services.price_feed
+    try:
+        first = price_feed.latest(ticker) or services.market.live_quote(ticker, fresh=False)
+    except Exception:
+        return jsonify({"error": "Unable to fetch stock data."}), 404
+    subscription = price_feed.subscribe(ticker, current=first)
+    if subscription is None:
+        return jsonify({"error": "Too many live viewers. Please try again later."}), 503
+    heartbeat = current_app.config["STREAM_HEARTBEAT"]  # the generator runs after the app context is gone
+
+    def events():
+        try:
+            yield "retry: 5000\n" + _sse(first)
+            while True:
+                event = subscription.get(timeout=heartbeat)
+                yield _sse(event) if event else ": keep-alive\n\n"
+        finally:
+            price_feed.unsubscribe(subscription)  # client went away
+
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@bp.route("/api/portfolio", methods=["POST"])
+def portfolio():
+    """Risk model for many holdings: {"holdings": [{"ticker" or "company", "shares" or "amount"}], "years": 5}."""
+    import pandas as pd
+    from portfolio import analyze_portfolio
+
+    payload = _json_object() or {}
+    holdings = payload.get("holdings")
+    if not isinstance(holdings, list) or not holdings:
+        return jsonify({"error": "Provide a list of holdings."}), 400
+    if len(holdings) > current_app.config["MAX_PORTFOLIO_SIZE"]:
+        return jsonify({"error": f"At most {current_app.config['MAX_PORTFOLIO_SIZE']} holdings per request."}), 400
+    if not all(isinstance(h, dict) and isinstance(h.get("ticker") or "", str) and isinstance(h.get("company") or "", str)
+               for h in holdings):
+        return jsonify({"error": "Each holding must be an object with a ticker or company name."}), 400
+    try:
+        years = int(payload.get("years", 5))
+        entries = [((h.get("ticker") or "").strip().upper(), (h.get("company") or "").strip(),
+                    float(h.get("shares") or 0), float(h.get("amount") or 0)) for h in holdings]
+    except (TypeError, ValueError):
+        return jsonify({"error": "Each holding needs a ticker or company and a number of shares or an amount."}), 400
+    if not 1 <= years <= 50:
+        return jsonify({"error": "Years must be between 1 and 50."}), 400
+    if any((not ticker and not company) or not math.isfinite(shares + amount)
+           or shares < 0 or amount < 0 or shares + amount <= 0
+           for ticker, company, shares, amount in entries):
+        return jsonify({"error": "Each holding needs a ticker or company and a positive number of shares or amount."}), 400
+
+    resolved = resolve_tickers([company for ticker, company, _, _ in entries if not ticker and company])
+    rows = [(ticker or resolved.get(company), company or ticker, shares, amount)
+            for ticker, company, shares, amount in entries]
+    unresolved = [name for symbol, name, _, _ in rows if not symbol or symbol in ("INVALID", "UNAVAILABLE")]
+    rows = pd.DataFrame([(symbol, shares, amount) for symbol, _, shares, amount in rows
+                         if symbol and symbol not in ("INVALID", "UNAVAILABLE")],
+                        columns=["ticker", "shares", "amount"]).groupby("ticker").sum()  # repeats add up
+    if rows.empty:
+        return jsonify({"error": "None of the holdings could be resolved.", "unresolved": unresolved}), 404
+
+    try:
+        panel = get_services().market.close_panel(list(rows.index))
+    except Exception:
+        return jsonify({"error": "Unable to fetch stock data."}), 502
+    unresolved += [ticker for ticker in rows.index if ticker not in panel.columns]
+    if panel.empty:
+        return jsonify({"error": "Unable to fetch stock data.", "unresolved": unresolved}), 404
+    try:
+        result = analyze_portfolio(panel, shares=rows["shares"], amounts=rows["amount"], years=years)
+    except ValueError as e:
+        return jsonify({"error": str(e), "unresolved": unresolved}), 422
+
+    table = result["holdings"].round(6)
+    return jsonify({
+        "total_value": round(result["total_value"], 2),
+        "volatility": round(result["volatility"], 6),
+        "expected_return": round(result["expected_return"], 6),
+        "diversification_ratio": round(result["diversification_ratio"], 4),
+        "columns": ["ticker"] + list(table.columns),
+        "rows": [[ticker] + list(row) for ticker, row in zip(table.index, table.itertuples(index=False))],
+        "years": result["years"].tolist(),
+        "bands": {str(p): band.round(2).tolist() for p, band in zip(result["percentiles"], result["bands"])},
+        "unresolved": unresolved,
+    })
+
+@bp.route("/api/projection", methods=["GET", "POST"])
+async def projection():
+    """Investment projection as JSON (ticker, amount, years) so the page can update in place."""
+    from projections import project_investment
+
+    params = _params()
+    if params is None:
+        return jsonify({"error": "Send the parameters as a JSON object, a form or a query string."}), 400
+    ticker = str(params.get("ticker") or "").strip().upper()
+    try:
+        amount = float(params.get("amount"))
+        years = int(params.get("years"))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Please enter valid numbers for amount and years."}), 400
+    if not math.isfinite(amount) or amount <= 0:
+        return jsonify({"error": "Amount must be greater than ₹0. Please enter a positive value."}), 400
+    if not 1 <= years <= 50:
+        return jsonify({"error": "Years must be between 1 and 50."}), 400
+
+    # Served from MongoDB or the in-process caches whenever the stock card was just shown
+    company_details, stock_data = await get_analysis_async(ticker)
+    if not stock_data or not company_details:
+        return jsonify({"error": "Unable to fetch stock data."}), 404
+
+    result = project_investment(amount, years, stock_data.latest_price, company_details, stock_data.volatility)
+    return jsonify({"ticker": ticker, "name": company_details["Name"],
+                    "recommendation": stock_data.recommendation, **result})
+
+def _number_list(value, cast=float):
+    """Parse a JSON list or a comma-separated string of numbers."""
+    if value is None or value == "":
+        return []
+    items = value if isinstance(value, list) else str(value).split(",")
+    return [cast(item) for item in items]
+
+@bp.route("/api/projection/grid", methods=["GET", "POST"])
+async def projection_grid():
+    """Sensitivity table for one ticker: every amount x horizon x annual-return assumption at once."""
+    from projections import investment_assumptions, project_grid
+
+    params = _params()
+    if params is None:
+        return jsonify({"error": "Send the parameters as a JSON object, a form or a query string."}), 400
+    ticker = str(params.get("ticker") or "").strip().upper()
+    try:
+        amounts = _number_list(params.get("amounts"))
+        years = _number_list(params.get("years", "1,3,5,10,15,20,25,30"), int)
+        returns = _number_list(params.get("returns"))
+    except (TypeError, ValueError):
+        return jsonify({"error": "amounts, years and returns must be lists of numbers."}), 400
+    if not amounts or any(not math.isfinite(amount) or amount <= 0 for amount in amounts):
+        return jsonify({"error": "Provide one or more amounts greater than ₹0."}), 400
+    if any(not math.isfinite(r) or r <= -1 for r in returns):
+        return jsonify({"error": "Annual returns must be numbers greater than -1 (a 100% loss)."}), 400
+    if not years or any(not 1 <= y <= 50 for y in years):
+        return jsonify({"error": "Years must be between 1 and 50."}), 400
+    if len(amounts) * len(years) * max(len(returns), 1) > current_app.config["MAX_GRID_CELLS"]:
+        return jsonify({"error": "Grid is too large."}), 400
+
+    company_details, stock_data = await get_analysis_async(ticker)
+    if not stock_data or not company_details:
+        return jsonify({"error": "Unable to fetch stock data."}), 404
+
+    annual_return, beta, vol_factor = investment_assumptions(company_details, stock_data.volatility)
+    returns = returns or [annual_return]
+    grid = project_grid(amounts, years, returns, stock_data.latest_price, beta, vol_factor)
+    return jsonify({
+        "ticker": ticker,
+        "name": company_details["Name"],
+        "latest_price": stock_data.latest_price,
+        "beta": beta,
+        "vol_factor": vol_factor,
+        "amounts": amounts,
+        "years": years,
+        "returns": returns,
+        # Each table is indexed [amount][year][return]
+        **{name: values.round(4).tolist() for name, values in grid.items()},
+    })
+
+@bp.route("/api/projection/simulate", methods=["GET", "POST"])
+async def projection_simulate():
+    """Monte Carlo value bands and probability of loss per horizon, from the ticker's daily returns."""
+    from projections import simulate_investment
+
+    params = _params()
+    if params is None:
+        return jsonify({"error": "Send the parameters as a JSON object, a form or a query string."}), 400
+    ticker = str(params.get("ticker") or "").strip().upper()
+    try:
+        amount = float(params.get("amount"))
+        years = int(params.get("years"))
+        n_paths = int(params.get("paths", 10_000))
+        seed = int(params["seed"]) if params.get("seed") not in (None, "") else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "Please enter valid numbers for amount, years and paths."}), 400
+    if not math.isfinite(amount) or amount <= 0:
+        return jsonify({"error": "Amount must be greater than ₹0. Please enter a positive value."}), 400
+    if not 1 <= years <= 50:
+        return jsonify({"error": "Years must be between 1 and 50."}), 400
+    if not 1 <= n_paths <= current_app.config["MAX_SIMULATION_PATHS"]:
+        return jsonify({"error": f"paths must be between 1 and {current_app.config['MAX_SIMULATION_PATHS']}."}), 400
+
+    try:
+        history = await asyncio.to_thread(get_services().market.get_history, ticker)
+    except Exception:
+        return jsonify({"error": "Unable to fetch stock data."}), 404
+    if history.empty:
+        return jsonify({"error": "Unable to fetch stock data."}), 404
+
+    try:
+        result = simulate_investment(history["Close"].pct_change().dropna().to_numpy(),
+                                     amount, years, n_paths=n_paths, seed=seed)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 422
+    return jsonify({
+        "ticker": ticker,
+        "amount": amount,
+        "paths": n_paths,
+        **result,
+        "bands": {str(p): band.round(2).tolist() for p, band in zip(result["percentiles"], result["bands"])},
+        "mean": result["mean"].round(2).tolist(),
+        "probability_of_loss": result["probability_of_loss"].round(4).tolist(),
+    })
+
+@bp.route("/history", methods=["GET", "POST"])
 def history():
     # Initialize session history if not already present
     if "history" not in session:
@@ -504,123 +1084,20 @@ def history():
     if request.method == "POST" and "clear_history" in request.form:
         session["history"] = []
         session.modified = True  # Ensure session updates
-        return redirect(url_for("history"))
-
-    history_html = "<ul>"
-    if session["history"]:
-        for item in session["history"]:
-            history_html += f"""
-            <li>
-                <a href="{url_for('index', company_name=item)}" class="history-item">{item}</a>
-            </li>
-            """
-    else:
-        history_html += "<li>No history yet.</li>"
-    history_html += "</ul>"
-
-    return f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Search History - Live Stock Advisor</title>
-        <style>
-            body {{
-                font-family: 'Segoe UI', Arial, sans-serif;
-                background: url('/static/kl.webp') no-repeat center center fixed;
-                background-size: cover;
-                color: #fff;
-                margin: 0;
-                padding: 0;
-                display: flex;
-                justify-content: center;
-                align-items: center;
-                min-height: 100vh;
-            }}
-            .container {{
-                background: rgba(0, 0, 0, 0.85);
-                padding: 30px;
-                border-radius: 15px;
-                max-width: 800px;
-                box-shadow: 0 0 20px rgba(255, 255, 255, 0.3);
-                overflow-y: auto;
-                max-height: 85vh;
-            }}
-            h1 {{
-                color: #00e676;
-                text-shadow: 1px 1px 5px rgba(0, 0, 0, 0.5);
-                text-align: center;
-            }}
-            ul {{
-                list-style: none;
-                padding: 0;
-            }}
-            li {{
-                margin: 10px 0;
-            }}
-            .history-item {{
-                display: block;
-                padding: 10px;
-                background: rgba(255, 255, 255, 0.1);
-                border-radius: 8px;
-                color: #fff;
-                text-decoration: none;
-                font-size: 16px;
-                transition: all 0.3s;
-            }}
-            .history-item:hover {{
-                background: rgba(0, 230, 118, 0.3);
-                transform: scale(1.02);
-            }}
-            button, .back-button {{
-                padding: 12px 20px;
-                font-size: 16px;
-                border-radius: 8px;
-                border: none;
-                margin: 10px;
-                background: #00e676;
-                color: #fff;
-                font-weight: bold;
-                cursor: pointer;
-                transition: all 0.3s;
-                text-decoration: none;
-                display: inline-block;
-            }}
-            button:hover, .back-button:hover {{
-                background: #00c853;
-                transform: scale(1.05);
-            }}
-            .button-bar {{
-                text-align: center;
-                margin-top: 20px;
-            }}
-            ::-webkit-scrollbar {{
-                width: 10px;
-            }}
-            ::-webkit-scrollbar-thumb {{
-                background: #00e676;
-                border-radius: 5px;
-            }}
-            ::-webkit-scrollbar-track {{
-                background: rgba(255, 255, 255, 0.1);
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>📜 Search History</h1>
-            {history_html}
-            <div class="button-bar">
-                <a href="{url_for('index')}" class="back-button">Back to Home</a>
-                <form method="post" style="display: inline;">
-                    <button type="submit" name="clear_history" value="clear">Clear History</button>
-                </form>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+        return redirect(url_for(".history"))
+
+    return render_template("history.html", history=session["history"])
+
+@bp.cli.command("refresh-symbols")
+@click.argument("path", type=click.Path(dir_okay=False))
+@click.option("--url", default=NSE_EQUITY_LIST_URL, show_default=True, help="Where to download the equity list.")
+def refresh_symbols(path, url):
+    """Download NSE's equity list to PATH, for use as FLASK_SYMBOL_MASTER."""
+    try:
+        index = refresh_symbol_master(path, url)
+    except Exception as e:
+        raise click.ClickException(f"Could not refresh the symbol master: {e}")
+    click.echo(f"Wrote {len(index.symbols())} symbols to {path}")
 
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    create_app({"DEBUG": True}).run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
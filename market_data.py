@@ -0,0 +1,368 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pandas as pd
+import yfinance as yf
+from pymongo.errors import PyMongoError
+
+from cache import SingleFlight, TTLCache
+from indicators import IndicatorState
+from metrics import timed
+from price_store import BAR_FIELDS, MARKET_TZ
+from scheduler import IST, is_market_open
+from upstream import UpstreamUnavailable, call_yahoo, get_session
+
+# Time-to-live per data class, in seconds: prices move constantly, daily bars only
+# change once a session, and company profile fields (sector, CEO, ...) almost never.
+QUOTE_TTL = 60
+HISTORY_TTL = 15 * 60
+INFO_TTL = 6 * 60 * 60
+
+quote_cache = TTLCache(maxsize=1024, ttl=QUOTE_TTL)
+history_cache = TTLCache(maxsize=256, ttl=HISTORY_TTL)
+info_cache = TTLCache(maxsize=1024, ttl=INFO_TTL)
+# A bulk download of more tickers than this goes to bulk_history_cache instead of history_cache,
+# so one large portfolio or watchlist cannot evict the histories users are viewing
+MAX_CACHED_DOWNLOAD = history_cache.maxsize // 4
+bulk_history_cache = TTLCache(maxsize=1024, ttl=HISTORY_TTL)
+# Incremental moving-average/volatility state per ticker; reseeded from history when it expires
+indicator_cache = TTLCache(maxsize=4096, ttl=HISTORY_TTL)
+
+# Concurrent misses for the same ticker share one Yahoo request
+flights = SingleFlight()
+
+# Optional local store of daily bars (see use_price_store)
+price_store = None
+
+# A stored close further than this from Yahoo's means past prices were re-adjusted
+ADJUSTMENT_TOLERANCE = 0.005
+
+
+def use_price_store(store):
+    """Serve daily history from a PriceStore, downloading only the bars it does not have yet."""
+    global price_store
+    price_store = store
+
+
+def _ticker(ticker):
+    return yf.Ticker(ticker, session=get_session())
+
+
+def _market_time(history):
+    """Index daily bars in market time: yf.download returns them tz-naive, Ticker.history tz-aware."""
+    if not isinstance(history.index, pd.DatetimeIndex):
+        return history
+    index = history.index
+    return history.set_axis(index.tz_localize(MARKET_TZ) if index.tz is None else index.tz_convert(MARKET_TZ))
+
+
+class MarketData:
+    """One ticker's 1-year daily history and info dict, fetched once per analysis."""
+
+    def __init__(self, ticker, history, info, quote=None):
+        self.ticker = ticker
+        self.history = history
+        self.info = info or {}
+        self.quote = quote
+
+    @property
+    def close(self):
+        return self.history["Close"]
+
+    @property
+    def latest_price(self):
+        """The cached live quote, falling back to the last daily close."""
+        if self.quote is not None:
+            return self.quote
+        return float(self.close.iloc[-1])
+
+
+def _full_history(stock, ticker):
+    history = call_yahoo(stock.history, period="1y", interval="1d")
+    if not history.empty:
+        indicator_cache.invalidate(ticker)  # past closes may have been re-adjusted
+        price_store.replace(ticker, history)
+    return history
+
+
+def _incremental_history(ticker):
+    """Bars from the price store plus whatever Yahoo has after the last stored session."""
+    stock = _ticker(ticker)
+    last = price_store.last_bar(ticker)
+    if last is None:
+        return _full_history(stock, ticker)
+    last_date = pd.Timestamp(last["date"], tz="UTC")
+    if last_date < pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=365):
+        return _full_history(stock, ticker)
+
+    # Refetch from the last stored session too, to check it against the stored close
+    recent = call_yahoo(stock.history, start=last_date.tz_convert(MARKET_TZ).date(), interval="1d")
+    if not recent.empty:
+        overlap = recent[recent.index == last_date.tz_convert(recent.index.tz)]
+        if not overlap.empty and abs(overlap["Close"].iloc[0] - last["Close"]) > ADJUSTMENT_TOLERANCE * last["Close"]:
+            return _full_history(stock, ticker)  # a split or dividend re-adjusted the past
+        price_store.append(ticker, recent, after=last["date"])
+
+    stored = price_store.load(ticker)
+    unfinished = recent[recent.index > stored.index[-1]] if not recent.empty else recent
+    return pd.concat([stored, unfinished[list(BAR_FIELDS)]]) if not unfinished.empty else stored
+
+
+def _download_history(ticker):
+    history = None
+    if price_store is not None:
+        try:
+            history = _incremental_history(ticker)
+        except PyMongoError:
+            history = None  # store unavailable; fall back to a full download
+    if history is None:
+        history = call_yahoo(_ticker(ticker).history, period="1y", interval="1d")
+    history = _market_time(history)
+    if not history.empty:
+        history_cache.set(ticker, history)
+        # A fresh download already carries the latest price, so seed the quote cache for free.
+        quote_cache.set(ticker, float(history["Close"].iloc[-1]))
+    return history
+
+
+def get_history(ticker):
+    """Return the 1-year daily history for a ticker, downloading it only when the cache is stale."""
+    history = history_cache.get(ticker)
+    if history is None:
+        with timed("history"):
+            try:
+                history = flights.do(("history", ticker), _download_history, ticker)
+            except UpstreamUnavailable:
+                history = _stale_history(ticker)
+    return history
+
+
+def _stale_history(ticker):
+    """While Yahoo is degraded, serve the expired cached history or the stored bars instead."""
+    history = history_cache.peek_stale(ticker)
+    if history is None:
+        history = bulk_history_cache.peek_stale(ticker)
+    if history is None and price_store is not None:
+        try:
+            history = price_store.load(ticker)
+        except PyMongoError:
+            pass
+    if history is None or history.empty:
+        raise UpstreamUnavailable(f"No data for {ticker} while Yahoo is unavailable")
+    return history
+
+
+def _bulk_download(tickers, **kwargs):
+    """{ticker: daily history} from one yf.download; tickers Yahoo has no data for get an empty frame."""
+    with timed("history"):
+        data = call_yahoo(yf.download, tickers, interval="1d", group_by="ticker", auto_adjust=True,
+                          threads=True, progress=False, session=get_session(), **kwargs)
+    histories = {}
+    for ticker in tickers:
+        if isinstance(data.columns, pd.MultiIndex):
+            history = data[ticker] if ticker in data.columns.get_level_values(0) else pd.DataFrame()
+        else:
+            history = data
+        histories[ticker] = _market_time(history.dropna(how="all"))
+    return histories
+
+
+def _stored_histories(tickers):
+    """Stored bars for `tickers`, topped up by one bulk download from the oldest last-stored session.
+
+    Tickers with no stored bars, or whose past closes Yahoo has since re-adjusted, are left out.
+    """
+    try:
+        stored = price_store.load_many(tickers)
+    except PyMongoError:
+        return {}
+    if not stored:
+        return {}
+    start = min(history.index[-1] for history in stored.values())
+    recent = _bulk_download(list(stored), start=start.date())
+    histories = {}
+    for ticker, history in stored.items():
+        last, close = history.index[-1], history["Close"].iloc[-1]
+        new = recent.get(ticker, pd.DataFrame())
+        if not new.empty:
+            overlap = new[new.index == last]
+            if not overlap.empty and abs(overlap["Close"].iloc[0] - close) > ADJUSTMENT_TOLERANCE * close:
+                continue  # a split or dividend re-adjusted the past
+            new = new[new.index > last]
+        if not new.empty:
+            try:
+                price_store.append(ticker, new)
+            except PyMongoError:
+                pass
+            history = pd.concat([history, new[list(BAR_FIELDS)]])
+        histories[ticker] = history
+    return histories
+
+
+def _full_histories(tickers):
+    """A year of bars for each ticker in one bulk download, replacing whatever the price store had."""
+    histories = _bulk_download(tickers, period="1y")
+    if price_store is not None:
+        for ticker, history in histories.items():
+            if history.empty:
+                continue
+            indicator_cache.invalidate(ticker)
+            try:
+                price_store.replace(ticker, history)
+            except PyMongoError:
+                pass
+    return histories
+
+
+def get_histories(tickers, cache=True):
+    """Return {ticker: 1-year daily history}, fetching every uncached ticker with at most two bulk downloads.
+
+    With a price store, tickers it has bars for only download the sessions since then.
+    Downloads of more than MAX_CACHED_DOWNLOAD tickers are kept in bulk_history_cache, so
+    a large watchlist or portfolio does not evict the histories users are viewing; with
+    cache=False (the screener's sweep over every ticker) they are not kept at all.
+    """
+    histories = {ticker: history_cache.get(ticker) for ticker in tickers}
+    for ticker, history in histories.items():
+        if history is None:
+            histories[ticker] = bulk_history_cache.get(ticker)
+    missing = [ticker for ticker, history in histories.items() if history is None]
+    target = history_cache if len(missing) <= MAX_CACHED_DOWNLOAD else bulk_history_cache
+    if not missing:
+        return histories
+    try:
+        fetched = _stored_histories(missing) if price_store is not None else {}
+        rest = [ticker for ticker in missing if ticker not in fetched]
+        if rest:
+            fetched.update(_full_histories(rest))
+    except UpstreamUnavailable:
+        for ticker in missing:
+            try:
+                histories[ticker] = _stale_history(ticker)
+            except UpstreamUnavailable:
+                histories[ticker] = pd.DataFrame()
+        return histories
+    for ticker, history in fetched.items():
+        histories[ticker] = history
+        if cache and not history.empty:
+            target.set(ticker, history)
+            quote_cache.set(ticker, float(history["Close"].iloc[-1]))
+    return histories
+
+
+def close_panel(tickers, cache=True):
+    """Aligned (dates x tickers) panel of daily closes; tickers with no data are left out."""
+    histories = get_histories(tickers, cache=cache)
+    return pd.DataFrame({ticker: h["Close"] for ticker, h in histories.items() if not h.empty})
+
+
+def _download_info(ticker):
+    info = call_yahoo(lambda: _ticker(ticker).info)
+    if info:
+        info_cache.set(ticker, info)
+    return info
+
+
+def get_info(ticker):
+    """Return the Yahoo info dict for a ticker, cached for hours."""
+    info = info_cache.get(ticker)
+    if info is None:
+        with timed("info"):
+            try:
+                info = flights.do(("info", ticker), _download_info, ticker)
+            except UpstreamUnavailable:
+                info = info_cache.peek_stale(ticker)
+                if info is None:
+                    raise
+    return info
+
+
+def _download_quote(ticker):
+    quote = float(call_yahoo(lambda: _ticker(ticker).fast_info["last_price"]))
+    quote_cache.set(ticker, quote)
+    return quote
+
+
+def get_quote(ticker):
+    """Return the latest traded price for a ticker, cached for a minute."""
+    quote = quote_cache.get(ticker)
+    if quote is None:
+        with timed("quote"):
+            try:
+                quote = flights.do(("quote", ticker), _download_quote, ticker)
+            except UpstreamUnavailable:
+                quote = quote_cache.peek_stale(ticker)
+                if quote is None:
+                    raise
+    return quote
+
+
+def refresh_quote(ticker):
+    """Download the latest price now, ignoring the cache (shared with concurrent callers)."""
+    return flights.do(("quote", ticker), _download_quote, ticker)
+
+
+def indicator_state(ticker, history=None):
+    """The ticker's IndicatorState, seeded from its daily history on first use."""
+    state = indicator_cache.get(ticker)
+    if state is None:
+        state = IndicatorState.from_history(get_history(ticker) if history is None else history)
+        indicator_cache.set(ticker, state)
+    return state
+
+
+def _rounded(value, digits=2):
+    return None if value != value else round(float(value), digits)  # NaN -> None
+
+
+def live_quote(ticker, fresh=True):
+    """The latest price, day change and trend for live updates, from the ticker's incremental indicators."""
+    history = get_history(ticker)
+    if history.empty:
+        raise ValueError(f"No price history for {ticker}")
+    price = refresh_quote(ticker) if fresh else get_quote(ticker)
+    # While the market is open, the first quote of a new day starts a new session
+    session = datetime.now(IST).date() if is_market_open() else None
+    snapshot = indicator_state(ticker, history).refresh(history, price, session)
+    return {
+        "ticker": ticker,
+        "price": _rounded(price),
+        "change": _rounded(snapshot["price_change"]),
+        "change_pct": _rounded(snapshot["price_change_pct"]),
+        "short_term_ma": _rounded(snapshot["short_term_ma"]),
+        "long_term_ma": _rounded(snapshot["long_term_ma"]),
+        "volatility": _rounded(snapshot["volatility"], 4),
+        "recommendation": snapshot["recommendation"],
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def refresh_market_data(ticker):
+    """Re-download a ticker's history (and its info, if that has expired) and replace the cached copies."""
+    history = flights.do(("history", ticker), _download_history, ticker)
+    if history.empty:
+        return MarketData(ticker, history, {})
+    return MarketData(ticker, history, get_info(ticker), quote=float(history["Close"].iloc[-1]))
+
+
+async def fetch_market_data_async(ticker):
+    """Assemble history, info and the latest quote for a ticker, downloading history and info concurrently."""
+    history, info = await asyncio.gather(
+        asyncio.to_thread(get_history, ticker),
+        asyncio.to_thread(get_info, ticker),
+    )
+    if history.empty:
+        return MarketData(ticker, history, {})
+    quote = await asyncio.to_thread(get_quote, ticker)  # usually just seeded by get_history
+    return MarketData(ticker, history, info, quote=quote)
+
+
+def cache_stats():
+    """Hit/miss counters for each market-data cache."""
+    return {
+        "quote": quote_cache.stats(),
+        "history": history_cache.stats(),
+        "bulk_history": bulk_history_cache.stats(),
+        "info": info_cache.stats(),
+        "indicators": indicator_cache.stats(),
+    }
@@ -0,0 +1,72 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from projections import SIMULATION_PERCENTILES, TRADING_DAYS
+
+
+def returns_matrix(close):
+    """Aligned (sessions x tickers) daily returns; a ticker with no bar on a session counts as flat."""
+    close = close.dropna(how="all").ffill()
+    return close.pct_change(fill_method=None).iloc[1:].fillna(0.0)
+
+
+def analyze_portfolio(close, shares=None, amounts=None, years=5, percentiles=SIMULATION_PERCENTILES):
+    """Risk and projected value of a portfolio held in the columns of a (dates x tickers) close panel.
+
+    Holdings are given as `shares` and/or rupee `amounts` (Series indexed by ticker, missing
+    tickers count as 0). Everything is computed on whole arrays: one covariance matrix, one
+    matrix-vector product for the risk contributions, one broadcast for the value bands.
+    """
+    close = close.dropna(how="all").ffill()
+    tickers = list(close.columns)
+    latest = close.iloc[-1].to_numpy()
+    values = np.zeros(len(tickers))
+    if shares is not None:
+        values += shares.reindex(tickers, fill_value=0.0).to_numpy(dtype=float) * latest
+    if amounts is not None:
+        values += amounts.reindex(tickers, fill_value=0.0).to_numpy(dtype=float)
+    total = values.sum()
+    if total <= 0:
+        raise ValueError("The portfolio has no value.")
+    weights = values / total
+
+    returns = returns_matrix(close).to_numpy()
+    if len(returns) < 2:
+        raise ValueError("Not enough price history to estimate risk.")
+    mean = returns.mean(axis=0) * TRADING_DAYS
+    cov = np.cov(returns, rowvar=False, ddof=1).reshape(len(tickers), len(tickers)) * TRADING_DAYS
+    asset_vol = np.sqrt(np.diag(cov))
+
+    marginal = cov @ weights
+    variance = float(weights @ marginal)
+    volatility = np.sqrt(variance)
+    contribution = weights * marginal / volatility if volatility else np.zeros_like(weights)
+    expected_return = float(weights @ mean)
+
+    # Lognormal value bands: percentile z-scores x horizons in one broadcast
+    horizon = np.arange(1, years + 1, dtype=float)
+    z = np.array([NormalDist().inv_cdf(p / 100) for p in percentiles])
+    drift = (expected_return - variance / 2) * horizon
+    bands = total * np.exp(drift[None, :] + z[:, None] * volatility * np.sqrt(horizon)[None, :])
+
+    return {
+        "holdings": pd.DataFrame({
+            "price": latest,
+            "value": values,
+            "weight": weights,
+            "volatility": asset_vol,
+            "expected_return": mean,
+            "risk_contribution": contribution,
+            "risk_share": contribution / volatility if volatility else np.zeros_like(weights),
+        }, index=pd.Index(tickers, name="ticker")),
+        "total_value": float(total),
+        "volatility": float(volatility),
+        "expected_return": expected_return,
+        # Above 1 when holdings offset each other; 1 means no diversification at all
+        "diversification_ratio": float(weights @ asset_vol / volatility) if volatility else 1.0,
+        "years": horizon.astype(int),
+        "percentiles": percentiles,
+        "bands": bands,
+    }
@@ -0,0 +1,157 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from scheduler import is_market_open
+
+
+class Subscription:
+    """One viewer's pending price events for a ticker.
+
+    At most `maxsize` events wait here; when a slow client falls behind, the oldest are dropped
+    (only the latest price matters), so a stalled connection never holds up the poller or grows
+    without bound.
+    """
+
+    def __init__(self, ticker, maxsize=8):
+        self.ticker = ticker
+        self.dropped = 0
+        self.closed = False
+        self._events = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+
+    def put(self, event):
+        with self._cond:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+            self._cond.notify()
+
+    def get(self, timeout):
+        """The next event, or None if none arrived within `timeout` seconds (time for a heartbeat)."""
+        with self._cond:
+            if not self._events and not self.closed:
+                self._cond.wait(timeout)
+            return self._events.popleft() if self._events else None
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class PriceFeed:
+    """Polls every ticker that has viewers once per interval and fans each new price out to all of them.
+
+    `fetch(ticker)` returns the ticker's latest event dict (with a "price" key). Upstream cost
+    grows with the number of distinct tickers being watched, not with the number of viewers;
+    events whose price has not changed are not sent.
+    """
+
+    def __init__(self, fetch, interval=5.0, closed_interval=60.0, queue_size=8, max_subscribers=1000,
+                 max_workers=4, logger=None):
+        self.fetch = fetch
+        self.interval = interval
+        self.closed_interval = closed_interval  # poll interval outside market hours
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.max_workers = max_workers
+        self.logger = logger
+        self.polls = 0
+        self.published = 0
+        self._dropped = 0  # by viewers that have since left
+        self._subscribers = {}  # ticker -> set of Subscription
+        self._latest = {}  # ticker -> last published event
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, ticker, current=None):
+        """Register a viewer for `ticker`; None when the feed already has `max_subscribers`.
+
+        `current` is the event the viewer starts from, so only later price changes are sent.
+        """
+        subscription = Subscription(ticker, self.queue_size)
+        with self._lock:
+            if self.subscriber_count() >= self.max_subscribers:
+                return None
+            self._subscribers.setdefault(ticker, set()).add(subscription)
+            if current is not None:
+                self._latest.setdefault(ticker, current)
+        self.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            viewers = self._subscribers.get(subscription.ticker)
+            if viewers is not None and subscription in viewers:
+                viewers.discard(subscription)
+                self._dropped += subscription.dropped
+                if not viewers:
+                    del self._subscribers[subscription.ticker]
+                    self._latest.pop(subscription.ticker, None)
+        subscription.close()
+
+    def latest(self, ticker):
+        return self._latest.get(ticker)
+
+    def subscriber_count(self):
+        return sum(len(viewers) for viewers in self._subscribers.values())
+
+    def tickers(self):
+        with self._lock:
+            return list(self._subscribers)
+
+    def dropped(self):
+        """Events slow viewers never received because newer prices replaced them."""
+        with self._lock:
+            return self._dropped + sum(s.dropped for viewers in self._subscribers.values() for s in viewers)
+
+    def publish(self, ticker, event):
+        """Send `event` to every viewer of `ticker` unless the price is unchanged; never blocks."""
+        with self._lock:
+            last = self._latest.get(ticker)
+            if last is not None and last["price"] == event["price"]:
+                return 0
+            viewers = list(self._subscribers.get(ticker, ()))
+            if viewers:
+                self._latest[ticker] = event
+        for subscription in viewers:
+            subscription.put(event)
+        self.published += len(viewers)
+        return len(viewers)
+
+    def _poll(self, ticker):
+        try:
+            self.publish(ticker, self.fetch(ticker))
+        except Exception as e:
+            if self.logger:
+                self.logger.warning("Live price poll of %s failed: %s", ticker, e)
+
+    def poll_once(self):
+        """Fetch each watched ticker once and publish the changes."""
+        tickers = self.tickers()
+        if tickers:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="price-poll") as pool:
+                list(pool.map(self._poll, tickers))
+            self.polls += len(tickers)
+        return tickers
+
+    def _loop(self):
+        while not self._stop.wait(self.interval if is_market_open() else self.closed_interval):
+            self.poll_once()
+
+    def start(self):
+        """Start the poller thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="price-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
@@ -0,0 +1,134 @@
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pandas as pd
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import CollectionInvalid, DuplicateKeyError, OperationFailure
+
+BAR_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+MARKET_TZ = "Asia/Kolkata"
+WRITE_LOCK_TIMEOUT = 30  # seconds before a worker's write lock on a ticker's bars is taken over
+
+
+class PriceStore:
+    """Daily OHLCV bars per ticker in a MongoDB time-series collection, appended incrementally.
+
+    Only completed sessions are stored; today's still-moving bar is kept by the caller.
+    Servers or test doubles without time-series support get an ordinary collection with a
+    unique (ticker, date) index instead. A time-series collection cannot enforce that index,
+    so writes to a ticker's bars are serialized across workers with a lock document in
+    `locks`, and load() drops any duplicate sessions that got through anyway.
+    """
+
+    def __init__(self, db, name="price_history", locks="locks"):
+        self.db = db
+        self.name = name
+        self.collection = db[name]
+        self.locks = db[locks]
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def ensure_collection(self):
+        with self._lock:
+            if self._ready:
+                return
+            try:
+                self.db.create_collection(self.name, timeseries={
+                    "timeField": "date", "metaField": "ticker", "granularity": "hours",
+                })
+            except CollectionInvalid:
+                pass  # already exists
+            except (OperationFailure, NotImplementedError):
+                self.collection.create_index([("ticker", ASCENDING), ("date", ASCENDING)], unique=True)
+            self.collection.create_index([("ticker", ASCENDING), ("date", DESCENDING)])
+            self._ready = True
+
+    def last_bar(self, ticker):
+        """The most recent stored bar for a ticker as a dict, or None."""
+        self.ensure_collection()
+        return self.collection.find_one({"ticker": ticker}, sort=[("date", DESCENDING)])
+
+    @contextmanager
+    def _writing(self, ticker):
+        """Hold the cross-worker write lock on a ticker's bars; yields False if another worker has it."""
+        key = f"bars:{ticker}"
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=WRITE_LOCK_TIMEOUT)
+        try:
+            self.locks.insert_one({"_id": key, "expires_at": expires_at})
+            locked = True
+        except DuplicateKeyError:
+            locked = self.locks.find_one_and_update(
+                {"_id": key, "expires_at": {"$lt": now}}, {"$set": {"expires_at": expires_at}}) is not None
+        try:
+            yield locked
+        finally:
+            if locked:
+                self.locks.delete_one({"_id": key})
+
+    def append(self, ticker, history, after=None):
+        """Store the completed bars of `history` newer than the last stored one; returns how many were written.
+
+        Nothing is written while another worker is storing the same ticker's bars (it is
+        writing the same sessions).
+        """
+        self.ensure_collection()
+        with self._writing(ticker) as locked:
+            return self._insert(ticker, history, after) if locked else 0
+
+    def replace(self, ticker, history):
+        """Swap all of a ticker's bars for the completed bars of `history`, e.g. after a split or
+        dividend re-adjusted its past prices."""
+        self.ensure_collection()
+        with self._writing(ticker) as locked:
+            if not locked:
+                return 0
+            self.collection.delete_many({"ticker": ticker})
+            return self._insert(ticker, history)
+
+    def _insert(self, ticker, history, after=None):
+        completed = history[history.index < pd.Timestamp.now(tz=history.index.tz).normalize()]
+        last = self.last_bar(ticker)  # read under the write lock: the caller's `after` may be stale
+        if last is not None:
+            after = last["date"] if after is None else max(after, last["date"])
+        if after is not None:
+            completed = completed[completed.index.tz_convert("UTC").tz_localize(None) > after]
+        docs = [
+            {"ticker": ticker, "date": date.tz_convert("UTC").to_pydatetime().replace(tzinfo=None),
+             **{field: float(row[field]) for field in BAR_FIELDS}}
+            for date, row in completed[list(BAR_FIELDS)].iterrows()
+        ]
+        if docs:
+            self.collection.insert_many(docs, ordered=False)
+        return len(docs)
+
+    def load(self, ticker, days=366):
+        """Return the stored bars of the last `days` days as a history frame indexed in market time."""
+        self.ensure_collection()
+        last = self.last_bar(ticker)
+        if last is None:
+            return pd.DataFrame(columns=list(BAR_FIELDS))
+        start = last["date"] - timedelta(days=days)
+        cursor = self.collection.find({"ticker": ticker, "date": {"$gt": start}},
+                                      {"_id": 0, "ticker": 0}).sort("date", ASCENDING)
+        return _frame(pd.DataFrame(list(cursor)))
+
+    def load_many(self, tickers, days=366):
+        """Return {ticker: stored bars of the last `days` days} in one query; tickers with none are left out."""
+        self.ensure_collection()
+        start = datetime.utcnow() - timedelta(days=days)
+        cursor = self.collection.find({"ticker": {"$in": list(tickers)}, "date": {"$gt": start}},
+                                      {"_id": 0}).sort("date", ASCENDING)
+        docs = pd.DataFrame(list(cursor))
+        if docs.empty:
+            return {}
+        return {ticker: _frame(bars.drop(columns="ticker")) for ticker, bars in docs.groupby("ticker")}
+
+
+def _frame(docs):
+    """Stored bar documents as a history frame indexed in market time, one row per session."""
+    dates = pd.DatetimeIndex(pd.to_datetime(docs.pop("date"), utc=True))
+    frame = docs.set_index(dates.tz_convert(MARKET_TZ))
+    frame.index.name = "Date"
+    return frame[~frame.index.duplicated(keep="last")][list(BAR_FIELDS)]
@@ -0,0 +1,100 @@
+import numpy as np
+
+DEFAULT_ANNUAL_RETURN = 0.10  # used when Yahoo has no dividend yield for the company
+DEFAULT_VOLATILITY = 0.10
+DEFAULT_BETA = 1.0
+
+TRADING_DAYS = 252
+SIMULATION_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def investment_assumptions(company_details, volatility):
+    """The (annual_return, beta, volatility) a projection assumes for a company, with defaults for gaps."""
+    annual_return = company_details["Dividend Yield"] if company_details["Dividend Yield"] != "N/A" else DEFAULT_ANNUAL_RETURN
+    beta = company_details["Beta"] if isinstance(company_details["Beta"], (int, float)) else DEFAULT_BETA
+    vol_factor = volatility if isinstance(volatility, float) else DEFAULT_VOLATILITY
+    return annual_return, beta, vol_factor
+
+
+def project_grid(amounts, years, annual_returns, latest_price, beta, vol_factor):
+    """Project every (amount, horizon, annual return) combination in one NumPy broadcast.
+
+    Every array in the returned dict has shape (len(amounts), len(years), len(annual_returns)).
+    """
+    amount = np.asarray(amounts, dtype=float).reshape(-1, 1, 1)
+    horizon = np.asarray(years, dtype=float).reshape(1, -1, 1)
+    annual_return = np.asarray(annual_returns, dtype=float).reshape(1, 1, -1)
+
+    num_shares = amount / latest_price
+    future_value = amount * (1 + annual_return) ** horizon
+    growth = future_value / amount
+    annualized_return = (growth ** (1 / horizon) - 1) * 100
+    cumulative_return = (growth - 1) * 100
+    total_dividends = latest_price * annual_return * num_shares * horizon
+    risk_adjusted_return = annualized_return / beta if beta != 0 else annualized_return
+
+    shape = np.broadcast_shapes(amount.shape, horizon.shape, annual_return.shape)
+    return {
+        "num_shares": np.broadcast_to(num_shares, shape),
+        "future_value": future_value,
+        "annualized_return": np.broadcast_to(annualized_return, shape),
+        "cumulative_return": np.broadcast_to(cumulative_return, shape),
+        "total_dividends": total_dividends,
+        "risk_adjusted_return": np.broadcast_to(risk_adjusted_return, shape),
+        "lower_bound": future_value * (1 - vol_factor),
+        "upper_bound": future_value * (1 + vol_factor),
+    }
+
+
+def project_investment(amount, years, latest_price, company_details, volatility):
+    """Project a lump-sum investment over `years`; pure math on already-validated numbers.
+
+    Returns a dict of the figures shown in the investment box.
+    """
+    annual_return, beta, vol_factor = investment_assumptions(company_details, volatility)
+    grid = project_grid([amount], [years], [annual_return], latest_price, beta, vol_factor)
+    result = {name: float(values[0, 0, 0]) for name, values in grid.items()}
+    result.update({
+        "amount": amount,
+        "years": years,
+        "latest_price": latest_price,
+        "total_investment": amount,
+        "annual_return": annual_return,
+        "beta": beta,
+        "vol_factor": vol_factor,
+    })
+    return result
+
+
+def simulate_investment(daily_returns, amount, years, n_paths=10_000, seed=None,
+                        percentiles=SIMULATION_PERCENTILES):
+    """Monte Carlo projection of `amount` over 1..`years` years, fully array-based.
+
+    The annual log-return distribution is estimated from the ticker's historical daily
+    returns; `n_paths` x `years` annual draws are then compounded with a cumulative sum.
+    Pass `seed` for reproducible results.
+
+    Returns percentile value bands (shape len(percentiles) x years), the mean value and
+    the probability of ending below `amount` at each horizon.
+    """
+    log_returns = np.log1p(np.asarray(daily_returns, dtype=float))
+    log_returns = log_returns[np.isfinite(log_returns)]
+    if log_returns.size < 2:
+        raise ValueError("Not enough price history to simulate returns.")
+    mu = log_returns.mean() * TRADING_DAYS
+    sigma = log_returns.std(ddof=1) * np.sqrt(TRADING_DAYS)
+
+    rng = np.random.default_rng(seed)
+    paths = rng.normal(mu, sigma, size=(n_paths, years))
+    np.cumsum(paths, axis=1, out=paths)
+    values = amount * np.exp(paths)
+
+    return {
+        "years": list(range(1, years + 1)),
+        "percentiles": list(percentiles),
+        "bands": np.percentile(values, percentiles, axis=0),
+        "mean": values.mean(axis=0),
+        "probability_of_loss": (values < amount).mean(axis=0),
+        "annual_mean_log_return": float(mu),
+        "annual_volatility": float(sigma),
+    }
@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as dtime
+from zoneinfo import ZoneInfo
+
+IST = ZoneInfo("Asia/Kolkata")
+MARKET_OPEN = dtime(9, 15)
+MARKET_CLOSE = dtime(15, 30)
+
+
+def is_market_open(now=None):
+    """True during NSE/BSE regular trading hours (Mon-Fri, 09:15-15:30 IST); holidays are not tracked."""
+    now = (now or datetime.now(IST)).astimezone(IST)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() <= MARKET_CLOSE
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` acquisitions per second on average, bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class PrefetchScheduler:
+    """Keeps the most-requested tickers warm by refreshing them in the background.
+
+    `refresh(ticker)` does the actual download and store; the scheduler only decides what to
+    refresh and when, with at most `max_workers` refreshes in flight and `rate` upstream
+    refreshes per second. Request counts halve every `half_life` seconds and tickers whose
+    count decays below MIN_SCORE are forgotten, so the ranking follows current interest.
+    """
+
+    MIN_SCORE = 0.5
+
+    def __init__(self, refresh, interval=300, top_n=50, max_workers=4, rate=2.0, half_life=60 * 60,
+                 market_hours_only=True, logger=None):
+        self.refresh = refresh
+        self.interval = interval
+        self.top_n = top_n
+        self.max_workers = max_workers
+        self.half_life = half_life
+        self.market_hours_only = market_hours_only
+        self.logger = logger
+        self.limiter = RateLimiter(rate, burst=max_workers)
+        self.max_tracked = top_n * 20
+        self._hits = Counter()
+        self._decayed = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, ticker, weight=1):
+        """Count a user request for `ticker`."""
+        if ticker:
+            with self._lock:
+                self._hits[ticker.upper()] += weight
+                if len(self._hits) > self.max_tracked:
+                    self._hits = Counter(dict(self._hits.most_common(self.max_tracked // 2)))
+
+    def seed(self, tickers):
+        """Register tickers known to be popular (e.g. recently stored in MongoDB) with a single hit each."""
+        with self._lock:
+            for ticker in tickers:
+                self._hits.setdefault(ticker.upper(), 1)
+
+    def decay(self, now=None):
+        """Scale every count down by the time since the last decay and drop the ones that faded out."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            factor = 0.5 ** ((now - self._decayed) / self.half_life)
+            self._decayed = now
+            self._hits = Counter({ticker: hits * factor for ticker, hits in self._hits.items()
+                                  if hits * factor >= self.MIN_SCORE})
+
+    def hot_tickers(self):
+        with self._lock:
+            return [ticker for ticker, _ in self._hits.most_common(self.top_n)]
+
+    def _refresh_one(self, ticker):
+        self.limiter.acquire()
+        try:
+            self.refresh(ticker)
+        except Exception as e:
+            if self.logger:
+                self.logger.warning("Background refresh of %s failed: %s", ticker, e)
+
+    def run_once(self):
+        """Refresh every hot ticker once and wait for all of them to finish."""
+        tickers = self.hot_tickers()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="prefetch") as pool:
+            for ticker in tickers:
+                pool.submit(self._refresh_one, ticker)
+        return tickers
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.decay()
+            if self.market_hours_only and not is_market_open():
+                continue
+            self.run_once()
+
+    def start(self):
+        """Start the background thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="prefetch-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
@@ -0,0 +1,182 @@
+import re
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from analytics import analyze_panel
+from scheduler import RateLimiter, is_market_open
+
+# Indicator columns of the screener table; text columns match by substring, the rest numerically
+NUMERIC_COLUMNS = ("latest_price", "price_change_pct", "yearly_change", "volatility",
+                   "pe", "dividend_yield", "beta", "market_cap")
+TEXT_COLUMNS = ("name", "sector", "recommendation")
+COLUMNS = TEXT_COLUMNS[:2] + NUMERIC_COLUMNS + TEXT_COLUMNS[2:]
+
+# Info dict field behind each fundamental column
+INFO_FIELDS = {
+    "name": "longName",
+    "sector": "sector",
+    "pe": "trailingPE",
+    "dividend_yield": "dividendYield",  # percent, as Yahoo reports it
+    "beta": "beta",
+    "market_cap": "marketCap",
+}
+
+OPERATORS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "=": np.equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+_CONDITION = re.compile(r"^\s*(\w+)\s*(<=|>=|==|!=|<|>|=)\s*(.+?)\s*%?\s*$")
+
+
+def parse_filters(text):
+    """Parse "pe < 20 and dividend_yield > 2" (or comma-separated) into (column, operator, value) triples."""
+    filters = []
+    for condition in re.split(r"\s+and\s+|,", text or "", flags=re.IGNORECASE):
+        if not condition.strip():
+            continue
+        match = _CONDITION.match(condition)
+        if not match:
+            raise ValueError(f"Cannot read the condition {condition.strip()!r}.")
+        column, op, value = match.groups()
+        column = column.lower()
+        if column in NUMERIC_COLUMNS:
+            try:
+                value = float(value)
+            except ValueError:
+                raise ValueError(f"{column} must be compared with a number.") from None
+        elif column in TEXT_COLUMNS:
+            if op not in ("=", "==", "!="):
+                raise ValueError(f"{column} can only be matched with = or !=.")
+        else:
+            raise ValueError(f"Unknown column {column!r}; use one of {', '.join(COLUMNS)}.")
+        filters.append((column, op, value))
+    return filters
+
+
+def _fundamentals(info):
+    row = {}
+    for column, field in INFO_FIELDS.items():
+        value = (info or {}).get(field)
+        if column in NUMERIC_COLUMNS:
+            value = float(value) if isinstance(value, (int, float)) else np.nan
+        row[column] = value
+    return row
+
+
+class Screener:
+    """Precomputed stock-card indicators for a whole ticker universe, in one columnar DataFrame.
+
+    A background thread rebuilds the table batch by batch: closes come from one bulk download
+    per batch and go through analyze_panel (the math behind get_stock_data); fundamentals come
+    from the cached info dicts, fetched at most `info_rate` per second. Each finished batch is
+    merged into a new frame that replaces the old one whole, so queries never wait on a refresh
+    and answer with boolean masks over the columns.
+    """
+
+    def __init__(self, universe, load_closes, load_info, interval=30 * 60, batch_size=100,
+                 info_rate=2.0, market_hours_only=True, logger=None):
+        self.universe = universe  # () -> list of tickers
+        self.load_closes = load_closes  # tickers -> (dates x tickers) close panel
+        self.load_info = load_info  # ticker -> info dict
+        self.interval = interval
+        self.batch_size = batch_size
+        self.market_hours_only = market_hours_only
+        self.logger = logger
+        self.limiter = RateLimiter(info_rate, burst=max(1, int(info_rate)))
+        self.table = pd.DataFrame(columns=list(COLUMNS), index=pd.Index([], name="ticker"))
+        self.updated_at = None
+        self.refreshing = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _info(self, ticker):
+        self.limiter.acquire()
+        try:
+            return self.load_info(ticker)
+        except Exception as e:
+            if self.logger:
+                self.logger.warning("Screener could not fetch info for %s: %s", ticker, e)
+            return None
+
+    def refresh_batch(self, tickers):
+        """Recompute the indicators of `tickers` and merge them into the table; returns how many rows."""
+        panel = self.load_closes(tickers)
+        if panel.empty:
+            return 0
+        indicators = analyze_panel(panel)
+        fundamentals = pd.DataFrame.from_dict(
+            {ticker: _fundamentals(self._info(ticker)) for ticker in indicators.index}, orient="index")
+        batch = indicators.join(fundamentals)[list(COLUMNS)]
+        batch.index.name = "ticker"
+        with self._lock:
+            # Values a failed info fetch left empty keep their previous numbers
+            self.table = batch.combine_first(self.table)[list(COLUMNS)]
+        return len(batch)
+
+    def refresh(self):
+        """Rebuild the table over the current universe, one batch at a time."""
+        tickers = self.universe()
+        self.refreshing = True
+        try:
+            for start in range(0, len(tickers), self.batch_size):
+                if self._stop.is_set():
+                    break
+                try:
+                    self.refresh_batch(tickers[start:start + self.batch_size])
+                except Exception as e:
+                    if self.logger:
+                        self.logger.warning("Screener batch at %d failed: %s", start, e)
+            with self._lock:
+                self.table = self.table[self.table.index.isin(tickers)]
+            self.updated_at = datetime.now(timezone.utc)
+        finally:
+            self.refreshing = False
+
+    def query(self, filters=(), sort=None, descending=True, limit=50):
+        """Rows matching every (column, operator, value) filter, sorted; returns (matches, total matched)."""
+        table = self.table
+        mask = np.ones(len(table), dtype=bool)
+        for column, op, value in filters:
+            if column in TEXT_COLUMNS:
+                matched = table[column].astype("string").str.contains(value, case=False, regex=False, na=False)
+                mask &= matched.to_numpy() if op != "!=" else ~matched.to_numpy()
+            else:
+                mask &= OPERATORS[op](table[column].to_numpy(dtype=float), value)  # NaN never matches
+        result = table[mask]
+        if sort:
+            result = result.sort_values(sort, ascending=not descending, na_position="last")
+        return result.head(limit), int(mask.sum())
+
+    def _loop(self):
+        self.refresh()
+        while not self._stop.wait(self.interval):
+            if self.market_hours_only and not is_market_open():
+                continue
+            self.refresh()
+
+    def start(self):
+        """Start the background refresh thread (idempotent); the first build starts right away."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="screener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def __len__(self):
+        return len(self.table)
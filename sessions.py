@@ -0,0 +1,77 @@
+import secrets
+import threading
+from datetime import timedelta
+
+from flask.sessions import SessionInterface
+
+HISTORY_LIMIT = 20
+
+
+def add_to_history(history, name, limit=HISTORY_LIMIT):
+    """Return `history` with `name` moved to the most recent slot, deduplicated and capped at `limit`."""
+    key = name.casefold()
+    recent = [item for item in history if item.casefold() != key]
+    recent.append(name)
+    return recent[-limit:]
+
+
+class DeferredSessionInterface(SessionInterface):
+    """Builds the real session interface on the first request and hands every call to it.
+
+    Flask-Session's MongoDB interface connects (to create its TTL index) as soon as it is
+    built, which must not happen in create_app() or in a server's parent process.
+    """
+
+    def __init__(self, build):
+        self._build = build
+        self._interface = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        with self._lock:
+            if self._interface is None:
+                self._interface = self._build()
+            return self._interface
+
+    def open_session(self, app, request):
+        return self._get().open_session(app, request)
+
+    def save_session(self, app, session, response):
+        return self._get().save_session(app, session, response)
+
+
+def configure_sessions(app, client=None):
+    """Set up the session backend named by SESSION_BACKEND.
+
+    "cookie" (default) keeps the small, capped search history in Flask's signed session
+    cookie, so serving a request touches no storage at all; it needs a SECRET_KEY, which only
+    debug and testing apps may leave out (they get a random one). "mongodb" stores sessions in
+    MongoDB through Flask-Session, where a TTL index on the expiration time removes
+    expired sessions; `client` is a function returning the MongoClient, called on the
+    first request.
+    """
+    app.config.setdefault("SESSION_BACKEND", "cookie")
+    app.config.setdefault("PERMANENT_SESSION_LIFETIME", timedelta(days=30))
+    backend = app.config["SESSION_BACKEND"]
+    if backend == "cookie":
+        if not app.config.get("SECRET_KEY"):
+            if not (app.debug or app.testing):
+                raise ValueError("Cookie sessions are signed with SECRET_KEY; set FLASK_SECRET_KEY")
+            app.config["SECRET_KEY"] = secrets.token_hex(32)
+            app.logger.warning("No SECRET_KEY set; using a random one, so sessions end when the app restarts")
+        return
+    if backend != "mongodb":
+        raise ValueError(f"Unknown SESSION_BACKEND: {backend!r}")
+
+    app.config["SESSION_TYPE"] = "mongodb"
+    app.config.setdefault("SESSION_MONGODB_DB", app.config.get("MONGO_DB", "Mydatabase"))
+    app.config.setdefault("SESSION_MONGODB_COLLECT", "sessions")
+
+    def build():
+        from flask_session import Session
+
+        app.config["SESSION_MONGODB"] = client() if client is not None else None
+        Session(app)  # replaces app.session_interface with Flask-Session's
+        return app.session_interface
+
+    app.session_interface = DeferredSessionInterface(build)
@@ -0,0 +1,65 @@
+// Recalculate the investment box in place through /api/projection instead of re-posting the page.
+document.addEventListener("DOMContentLoaded", function () {
+    var form = document.querySelector(".investment-form form[data-ticker]");
+    var box = document.getElementById("projection");
+    if (!form || !box || !window.fetch) {
+        return;
+    }
+
+    function fixed(n, digits) {
+        return n.toLocaleString("en-US", {minimumFractionDigits: digits, maximumFractionDigits: digits, useGrouping: false});
+    }
+    function money(n) {
+        return n.toLocaleString("en-US", {minimumFractionDigits: 2, maximumFractionDigits: 2});
+    }
+    function escapeHtml(text) {
+        var div = document.createElement("div");
+        div.textContent = text;
+        return div.innerHTML;
+    }
+
+    function render(p) {
+        var html = "<div class='investment-box'><h3>💡 Investment Projection</h3>" +
+            "<p><strong>With ₹" + money(p.amount) + "</strong> invested in <strong>" + escapeHtml(p.name) +
+            "</strong> for <strong>" + p.years + " years</strong>:</p>" +
+            "<p>📊 Shares: <strong>" + fixed(p.num_shares, 2) + "</strong> at ₹" + fixed(p.latest_price, 2) + " each</p>" +
+            "<p>💰 Initial Investment: <strong>₹" + money(p.total_investment) + "</strong></p>" +
+            "<p>📈 Projected Value: <strong>₹" + money(p.future_value) + "</strong> (" + fixed(p.annual_return * 100, 1) + "% annual return)</p>" +
+            "<p>📅 Annualized Return: <strong>" + fixed(p.annualized_return, 2) + "%</strong></p>" +
+            "<p>🌟 Cumulative Return: <strong>" + fixed(p.cumulative_return, 2) + "%</strong></p>" +
+            "<p>💵 Total Dividends Earned: <strong>₹" + money(p.total_dividends) + "</strong> (assuming constant yield)</p>" +
+            "<p>🛡️ Risk-Adjusted Return: <strong>" + fixed(p.risk_adjusted_return, 2) + "%</strong> (adjusted by Beta: " + p.beta + ")</p>" +
+            "<p>📉 Value Range (Volatility ±" + fixed(p.vol_factor * 100, 1) + "%): <strong>₹" + money(p.lower_bound) +
+            " - ₹" + money(p.upper_bound) + "</strong></p>";
+        if (p.num_shares < 1) {
+            html += "<p class='warning'>⚠️ Note: Less than 1 share. Fractional shares may not be tradable on all platforms.</p>";
+        }
+        if (p.recommendation === "✅ Strong Buy") {
+            html += "<p class='success'>✅ Great opportunity based on current trends!</p>";
+        } else if (p.recommendation === "⚠️ Hold") {
+            html += "<p class='warning'>⚠️ Monitor closely or diversify.</p>";
+        } else {
+            html += "<p class='danger'>🚨 Consider alternatives.</p>";
+        }
+        return html + "<p class='note'>⚠️ Note: Projections assume stable conditions and constant dividend yield.</p></div>";
+    }
+
+    form.addEventListener("submit", function (event) {
+        event.preventDefault();
+        var params = new URLSearchParams({
+            ticker: form.dataset.ticker,
+            amount: form.elements.amount.value,
+            years: form.elements.years.value
+        });
+        fetch(form.dataset.endpoint + "?" + params.toString())
+            .then(function (response) { return response.json(); })
+            .then(function (p) {
+                box.innerHTML = p.error
+                    ? "<div class='investment-box error-box'><h3>❌ Error</h3><p>" + escapeHtml(p.error) + "</p></div>"
+                    : render(p);
+            })
+            .catch(function () {
+                form.submit();  // fall back to the full-page recalculation
+            });
+    });
+});
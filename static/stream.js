@@ -0,0 +1,29 @@
+// Keep the stock card's live price, day change and recommendation current from /api/stream/<ticker> (Server-Sent Events).
+document.addEventListener("DOMContentLoaded", function () {
+    var card = document.querySelector(".price[data-stream]");
+    if (!card || !window.EventSource) {
+        return;
+    }
+    var price = card.querySelector(".live-price");
+    var change = document.querySelector(".stock-card .day-change");
+    var recommendation = document.querySelector(".stock-card .live-recommendation");
+
+    function fixed(n) {
+        return n.toLocaleString("en-US", {minimumFractionDigits: 2, maximumFractionDigits: 2, useGrouping: false});
+    }
+
+    var source = new EventSource(card.dataset.stream);
+    source.addEventListener("price", function (e) {
+        var p = JSON.parse(e.data);
+        price.textContent = "₹" + fixed(p.price);
+        if (change) {
+            change.textContent = "₹" + fixed(p.change) + " (" + fixed(p.change_pct) + "%)";
+        }
+        if (recommendation && p.recommendation) {
+            recommendation.textContent = p.recommendation;
+        }
+    });
+    window.addEventListener("pagehide", function () {
+        source.close();
+    });
+});
@@ -0,0 +1,137 @@
+import bisect
+import csv
+import difflib
+import os
+import re
+import threading
+import urllib.request
+
+from cache import TTLCache
+
+DEFAULT_SYMBOL_MASTER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "symbols.csv")
+NSE_EQUITY_LIST_URL = "https://archives.nseindia.com/content/equities/EQUITY_L.csv"
+
+# Legal-form words that users rarely type and that only get in the way of matching
+_STOPWORDS = {"the", "limited", "ltd", "pvt", "private", "inc", "co", "corp"}
+
+
+def normalize_name(name):
+    """Lower-case a company name and strip punctuation and legal suffixes ("Larsen & Toubro Ltd." -> "larsen and toubro")."""
+    name = name.lower().replace("&", " and ")
+    words = re.sub(r"[^a-z0-9]+", " ", name).split()
+    return " ".join(word for word in words if word not in _STOPWORDS)
+
+
+class SymbolIndex:
+    """In-memory map of normalized company names and aliases to NSE/BSE ticker symbols.
+
+    The symbol master is only written by add() while loading; names resolved by a live
+    search are remembered with learn() in a bounded cache instead, so user input cannot
+    grow the index.
+    """
+
+    def __init__(self, negative_ttl=60 * 60, learned_ttl=24 * 60 * 60):
+        self._names = {}
+        self._keys = []  # sorted copy of the names, for prefix lookups with bisect
+        self._lock = threading.Lock()
+        self._missing = TTLCache(maxsize=4096, ttl=negative_ttl)
+        self._learned = TTLCache(maxsize=4096, ttl=learned_ttl)
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, name, symbol):
+        key = normalize_name(name)
+        if not key:
+            return
+        with self._lock:
+            if key not in self._names:
+                bisect.insort(self._keys, key)
+            self._names[key] = symbol
+
+    def lookup(self, name):
+        """Resolve a company name to a symbol by exact, then prefix, then fuzzy match; None if unknown."""
+        key = normalize_name(name)
+        if not key:
+            return None
+        symbol = self._names.get(key) or self._learned.get(key)
+        if symbol or len(key) < 3:
+            return symbol
+
+        # Prefix match: only accept it when every name starting with the query is the same company
+        start = bisect.bisect_left(self._keys, key)
+        matches = set()
+        for candidate in self._keys[start:start + 32]:
+            if not candidate.startswith(key):
+                break
+            matches.add(self._names[candidate])
+        if len(matches) == 1:
+            return matches.pop()
+        if matches:
+            return None
+
+        close = difflib.get_close_matches(key, self._keys, n=1, cutoff=0.85)
+        return self._names[close[0]] if close else None
+
+    def symbols(self):
+        """Every distinct ticker symbol in the index, sorted."""
+        with self._lock:
+            return sorted(set(self._names.values()))
+
+    def learn(self, name, symbol):
+        """Remember a symbol found by a live search for `name`, for a while."""
+        key = normalize_name(name)
+        if key:
+            self._learned.set(key, symbol)
+
+    def mark_missing(self, name):
+        """Remember that a name has no NSE/BSE listing, so repeat lookups skip the live search."""
+        self._missing.set(normalize_name(name), True)
+
+    def is_missing(self, name):
+        return self._missing.get(normalize_name(name), False)
+
+    def load_csv(self, path):
+        """Load a symbol master: either `symbol,name,aliases` rows or NSE's EQUITY_L.csv format."""
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+                if "name of company" in row:  # NSE equity list: bare symbols, no aliases
+                    symbol = row["symbol"] + ".NS"
+                    names = [row["name of company"]]
+                else:
+                    symbol = row["symbol"]
+                    names = [row["name"]] + [a for a in row.get("aliases", "").split("|") if a]
+                for name in names + [symbol.rsplit(".", 1)[0]]:
+                    self.add(name, symbol)
+        return self
+
+
+def load_symbol_index(path=DEFAULT_SYMBOL_MASTER):
+    """Build a SymbolIndex from a symbol-master file, or an empty one if the file is missing."""
+    index = SymbolIndex()
+    try:
+        index.load_csv(path)
+    except FileNotFoundError:
+        pass
+    return index
+
+
+def refresh_symbol_master(path, url=NSE_EQUITY_LIST_URL):
+    """Download NSE's current equity list to `path` and return it loaded as a SymbolIndex.
+
+    `path` is only replaced once the download parses into at least one symbol.
+    """
+    tmp = path + ".tmp"
+    req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
+    with urllib.request.urlopen(req, timeout=30) as resp, open(tmp, "wb") as f:
+        f.write(resp.read())
+    try:
+        index = SymbolIndex().load_csv(tmp)
+        if not len(index):
+            raise ValueError(f"{url} has no symbols")
+    except Exception:
+        os.remove(tmp)
+        raise
+    os.replace(tmp, path)
+    return index
@@ -0,0 +1,61 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import analyze_history
+from indicators import IndicatorState
+
+
+@pytest.fixture
+def history():
+    rng = np.random.default_rng(7)
+    index = pd.bdate_range(end="2025-06-30", periods=250, tz="Asia/Kolkata", name="Date")
+    close = 1000 * np.exp(np.cumsum(rng.normal(0.0004, 0.016, len(index))))
+    return pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+                         "Volume": 1_000_000}, index=index)
+
+
+def assert_same_analysis(incremental, recomputed):
+    for field in ("latest_price", "price_change", "price_change_pct", "yearly_change", "volatility"):
+        assert getattr(incremental, field) == pytest.approx(getattr(recomputed, field)), field
+    assert incremental.recommendation == recomputed.recommendation
+
+
+def test_incremental_analysis_matches_the_full_recompute(history):
+    state = IndicatorState.from_history(history.iloc[:-5])
+
+    # Five new sessions, then live ticks on the last one
+    assert_same_analysis(analyze_history(history, {}, state=state), analyze_history(history, {}))
+    for price in (990.0, 1012.5, 1003.25):
+        assert_same_analysis(analyze_history(history, {}, latest_price=price, state=state),
+                             analyze_history(history, {}, latest_price=price))
+
+
+def test_concurrent_syncs_push_each_new_session_once(history, monkeypatch):
+    state = IndicatorState.from_history(history.iloc[:-3])
+    start = threading.Barrier(8)
+    push = IndicatorState.push
+
+    def slow_push(self, price, session=None):
+        time.sleep(0.01)  # widen the window between reading the session and pushing
+        push(self, price, session)
+
+    monkeypatch.setattr(IndicatorState, "push", slow_push)
+
+    def sync():
+        start.wait()
+        state.sync(history)
+
+    threads = [threading.Thread(target=sync) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    fresh = IndicatorState.from_history(history)
+    np.testing.assert_allclose(state.long.values(), fresh.long.values())
+    np.testing.assert_allclose(state.returns.values(), fresh.returns.values())
+    assert state.session == fresh.session
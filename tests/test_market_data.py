@@ -0,0 +1,121 @@
+import mongomock
+import pandas as pd
+import pytest
+
+import market_data
+from price_store import MARKET_TZ, PriceStore
+
+
+def bars(days=5, tz=MARKET_TZ, close=100.0):
+    today = pd.Timestamp.now(tz=MARKET_TZ).normalize().tz_localize(None)
+    index = pd.date_range(end=today, periods=days, freq="D", name="Date")
+    index = index.tz_localize(tz) if tz else index
+    prices = [float(close + i) for i in range(days)]
+    return pd.DataFrame({"Open": prices, "High": prices, "Low": prices, "Close": prices, "Volume": 1000.0},
+                        index=index)
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    monkeypatch.setattr(market_data, "price_store", None)
+    caches = (market_data.history_cache, market_data.bulk_history_cache, market_data.quote_cache)
+    for cache in caches:
+        cache.clear()
+    yield
+    for cache in caches:
+        cache.clear()
+
+
+def fake_download(frames, calls=None):
+    """A stand-in for yf.download: daily bars come back tz-naive, grouped by ticker."""
+    def download(tickers, start=None, **kwargs):
+        if calls is not None:
+            calls.append({"tickers": list(tickers), "start": start, **kwargs})
+        since = {ticker: frames[ticker] for ticker in tickers}
+        if start is not None:
+            since = {ticker: frame[frame.index >= pd.Timestamp(start)] for ticker, frame in since.items()}
+        return pd.concat(since, axis=1)
+    return download
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = PriceStore(mongomock.MongoClient().db)
+    monkeypatch.setattr(market_data, "price_store", store)
+    return store
+
+
+def test_close_panel_mixes_cached_and_downloaded_histories(monkeypatch):
+    market_data.history_cache.set("TCS.NS", bars(tz=MARKET_TZ, close=100))
+    monkeypatch.setattr(market_data.yf, "download", fake_download({"INFY.NS": bars(tz=None, close=50)}))
+
+    panel = market_data.close_panel(["TCS.NS", "INFY.NS"])
+
+    assert list(panel.columns) == ["TCS.NS", "INFY.NS"]
+    assert str(panel.index.tz) == MARKET_TZ
+    assert len(panel) == 5 and not panel.isna().any().any()
+
+
+def test_downloaded_histories_are_cached_in_market_time(monkeypatch):
+    monkeypatch.setattr(market_data.yf, "download", fake_download({"INFY.NS": bars(tz=None)}))
+
+    market_data.get_histories(["INFY.NS"])
+
+    assert str(market_data.history_cache.get("INFY.NS").index.tz) == MARKET_TZ
+
+
+def test_bulk_histories_only_download_sessions_after_the_stored_ones(monkeypatch, store):
+    calls = []
+    frames = {"TCS.NS": bars(days=30, tz=None), "INFY.NS": bars(days=30, tz=None, close=50)}
+    monkeypatch.setattr(market_data.yf, "download", fake_download(frames, calls))
+
+    first = market_data.get_histories(["TCS.NS", "INFY.NS"])
+    assert calls[-1]["period"] == "1y" and calls[-1]["start"] is None
+    assert len(store.load("TCS.NS")) == 29  # today's bar is still moving
+
+    market_data.history_cache.clear()
+    second = market_data.get_histories(["TCS.NS", "INFY.NS"])
+    assert len(calls) == 2 and "period" not in calls[-1]
+    assert calls[-1]["start"] == (pd.Timestamp.now(tz=MARKET_TZ) - pd.Timedelta(days=1)).date()
+    for ticker in frames:
+        pd.testing.assert_series_equal(second[ticker]["Close"], first[ticker]["Close"])
+
+
+def test_bulk_histories_redownload_a_year_after_a_readjustment(monkeypatch, store):
+    calls = []
+    frames = {"TCS.NS": bars(days=30, tz=None)}
+    monkeypatch.setattr(market_data.yf, "download", fake_download(frames, calls))
+    market_data.get_histories(["TCS.NS"])
+
+    market_data.history_cache.clear()
+    frames["TCS.NS"] = bars(days=30, tz=None, close=50)  # a split halved every past close
+    history = market_data.get_histories(["TCS.NS"])["TCS.NS"]
+
+    assert [call.get("period") for call in calls] == ["1y", None, "1y"]
+    assert history["Close"].iloc[0] == 50
+    assert store.load("TCS.NS")["Close"].iloc[0] == 50
+
+
+def test_large_bulk_downloads_are_cached_apart_from_viewed_histories(monkeypatch):
+    calls = []
+    tickers = [f"T{i}.NS" for i in range(market_data.MAX_CACHED_DOWNLOAD + 1)]
+    monkeypatch.setattr(market_data.yf, "download", fake_download({t: bars(tz=None) for t in tickers}, calls))
+    market_data.history_cache.set("TCS.NS", bars())
+
+    market_data.get_histories(tickers)
+    market_data.get_histories(tickers)
+
+    assert len(calls) == 1
+    assert len(market_data.history_cache) == 1
+    assert len(market_data.bulk_history_cache) == len(tickers)
+
+
+def test_uncached_bulk_downloads_are_not_kept(monkeypatch):
+    calls = []
+    monkeypatch.setattr(market_data.yf, "download", fake_download({"INFY.NS": bars(tz=None)}, calls))
+
+    market_data.get_histories(["INFY.NS"], cache=False)
+    market_data.get_histories(["INFY.NS"], cache=False)
+
+    assert len(calls) == 2
+    assert len(market_data.history_cache) == len(market_data.bulk_history_cache) == 0
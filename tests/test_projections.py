@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from projections import SIMULATION_PERCENTILES, simulate_investment
+
+
+@pytest.fixture
+def daily_returns():
+    return np.random.default_rng(3).normal(0.0005, 0.015, 250)
+
+
+def test_same_seed_gives_identical_bands(daily_returns):
+    first = simulate_investment(daily_returns, 10_000, 5, n_paths=2_000, seed=42)
+    second = simulate_investment(daily_returns, 10_000, 5, n_paths=2_000, seed=42)
+
+    np.testing.assert_array_equal(first["bands"], second["bands"])
+    np.testing.assert_array_equal(first["probability_of_loss"], second["probability_of_loss"])
+
+
+def test_result_shapes(daily_returns):
+    result = simulate_investment(daily_returns, 10_000, 7, n_paths=2_000, seed=1)
+
+    assert result["years"] == list(range(1, 8))
+    assert result["bands"].shape == (len(SIMULATION_PERCENTILES), 7)
+    assert result["mean"].shape == result["probability_of_loss"].shape == (7,)
+    assert np.all(np.diff(result["bands"], axis=0) >= 0)  # higher percentiles, higher values
+    assert np.all((result["probability_of_loss"] >= 0) & (result["probability_of_loss"] <= 1))
+
+
+@pytest.mark.parametrize("daily_returns", [[], [0.01], [np.nan, np.nan, 0.01]])
+def test_too_few_returns_raise(daily_returns):
+    with pytest.raises(ValueError):
+        simulate_investment(daily_returns, 10_000, 5)
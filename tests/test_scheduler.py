@@ -0,0 +1,43 @@
+from scheduler import PrefetchScheduler
+
+
+def make_scheduler(**kwargs):
+    return PrefetchScheduler(lambda ticker: None, top_n=2, half_life=60, **kwargs)
+
+
+def test_hot_tickers_rank_by_request_count():
+    scheduler = make_scheduler()
+    for ticker, hits in [("tcs.ns", 3), ("INFY.NS", 5), ("ITC.NS", 1)]:
+        for _ in range(hits):
+            scheduler.record(ticker)
+
+    assert scheduler.hot_tickers() == ["INFY.NS", "TCS.NS"]
+
+
+def test_counts_decay_and_faded_tickers_are_forgotten():
+    scheduler = make_scheduler()
+    start = scheduler._decayed
+    scheduler.record("OLD.NS", weight=4)
+    scheduler.decay(now=start + 60)  # one half-life: 4 -> 2
+    scheduler.record("NEW.NS", weight=3)
+    assert scheduler.hot_tickers() == ["NEW.NS", "OLD.NS"]
+
+    scheduler.decay(now=start + 180)  # OLD.NS 0.5, NEW.NS 0.75
+    scheduler.decay(now=start + 240)  # 0.25 and 0.375, both below MIN_SCORE
+    assert scheduler.hot_tickers() == []
+
+
+def test_tracked_tickers_are_bounded():
+    scheduler = make_scheduler()
+    for i in range(scheduler.max_tracked + 1):
+        scheduler.record(f"T{i}.NS")
+
+    assert len(scheduler._hits) <= scheduler.max_tracked
+
+
+def test_run_once_refreshes_the_hot_tickers():
+    refreshed = []
+    scheduler = PrefetchScheduler(refreshed.append, top_n=5, rate=100)
+    scheduler.seed(["TCS.NS", "INFY.NS"])
+
+    assert sorted(scheduler.run_once()) == sorted(refreshed) == ["INFY.NS", "TCS.NS"]
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from screener import Screener, parse_filters
+
+INFO = {
+    "TCS.NS": {"longName": "Tata Consultancy Services", "sector": "Technology", "trailingPE": 28.0,
+               "dividendYield": 1.8},
+    "ITC.NS": {"longName": "ITC Limited", "sector": "Consumer Defensive", "trailingPE": 15.0,
+               "dividendYield": 3.1},
+    "PAYTM.NS": {"longName": "One 97 Communications", "sector": "Technology"},  # no PE or dividend
+}
+
+
+@pytest.fixture
+def screener():
+    index = pd.bdate_range(end="2025-06-30", periods=120, tz="Asia/Kolkata")
+    rng = np.random.default_rng(11)
+    panel = pd.DataFrame({ticker: 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index))))
+                          for ticker in INFO}, index=index)
+    screener = Screener(lambda: list(INFO), lambda tickers: panel[tickers], INFO.get, info_rate=1000)
+    screener.refresh()
+    return screener
+
+
+def test_parse_filters():
+    assert parse_filters("pe < 20 and dividend_yield>=2.5%, sector = tech") == [
+        ("pe", "<", 20.0), ("dividend_yield", ">=", 2.5), ("sector", "=", "tech")]
+    assert parse_filters("") == []
+    assert parse_filters("PE > 1 AND Beta<=1.2") == [("pe", ">", 1.0), ("beta", "<=", 1.2)]
+
+
+@pytest.mark.parametrize("text, message", [
+    ("pe", "Cannot read"),
+    ("pe < cheap", "number"),
+    ("sector > tech", "= or !="),
+    ("price < 10", "Unknown column"),
+])
+def test_parse_filters_rejects(text, message):
+    with pytest.raises(ValueError, match=message):
+        parse_filters(text)
+
+
+def test_query_filters_and_sorts(screener):
+    matches, total = screener.query(parse_filters("sector = tech"), sort="pe", descending=True)
+    assert total == 2
+    assert list(matches.index) == ["TCS.NS", "PAYTM.NS"]  # missing PE sorts last
+
+    matches, total = screener.query(parse_filters("pe < 20"))
+    assert (list(matches.index), total) == (["ITC.NS"], 1)  # NaN never matches a comparison
+
+    matches, total = screener.query(parse_filters("sector != tech"))
+    assert list(matches.index) == ["ITC.NS"]
+
+
+def test_query_limit_keeps_the_total(screener):
+    matches, total = screener.query(sort="latest_price", limit=1)
+    assert len(matches) == 1 and total == 3
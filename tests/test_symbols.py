@@ -0,0 +1,51 @@
+import pytest
+
+from symbols import SymbolIndex, normalize_name
+
+
+@pytest.fixture
+def index():
+    index = SymbolIndex()
+    for name, symbol in [
+        ("Tata Consultancy Services Limited", "TCS.NS"), ("tcs", "TCS.NS"),
+        ("Tata Motors Ltd.", "TATAMOTORS.NS"), ("Larsen & Toubro Ltd", "LT.NS"),
+        ("Infosys Limited", "INFY.NS"), ("HDFC Bank Limited", "HDFCBANK.NS"),
+    ]:
+        index.add(name, symbol)
+    return index
+
+
+def test_normalize_name_drops_punctuation_and_legal_suffixes():
+    assert normalize_name("Larsen & Toubro Ltd.") == "larsen and toubro"
+    assert normalize_name("  The HDFC Bank, Limited ") == "hdfc bank"
+
+
+@pytest.mark.parametrize("query, symbol", [
+    ("TCS", "TCS.NS"),                          # alias
+    ("tata consultancy services", "TCS.NS"),   # exact name, legal suffix dropped
+    ("Larsen and Toubro", "LT.NS"),            # "&" spelled out
+    ("infos", "INFY.NS"),                       # unique prefix
+    ("hdfc bnak", "HDFCBANK.NS"),               # typo, fuzzy match
+])
+def test_lookup_resolves(index, query, symbol):
+    assert index.lookup(query) == symbol
+
+
+@pytest.mark.parametrize("query", ["tata", "xy", "", "apple"])
+def test_lookup_gives_up_on_ambiguous_short_or_unknown_names(index, query):
+    assert index.lookup(query) is None
+
+
+def test_learned_names_resolve_without_growing_the_master(index):
+    size = len(index)
+    index.learn("Zomato", "ETERNAL.NS")
+
+    assert index.lookup("zomato ltd") == "ETERNAL.NS"
+    assert len(index) == size
+    assert "ETERNAL.NS" not in index.symbols()
+
+
+def test_missing_names_are_remembered(index):
+    index.mark_missing("Apple Inc")
+    assert index.is_missing("apple")
+    assert not index.is_missing("infosys")
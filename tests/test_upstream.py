@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+import upstream
+from upstream import CircuitBreaker, UpstreamUnavailable, with_retry
+
+
+class ServerError(Exception):
+    response = type("Response", (), {"status_code": 503})()
+
+
+def fail():
+    raise UpstreamUnavailable("down")
+
+
+def trip(breaker):
+    for _ in range(breaker.threshold):
+        with pytest.raises(UpstreamUnavailable):
+            breaker.call(fail)
+
+
+def test_open_circuit_fails_fast():
+    breaker = CircuitBreaker(threshold=2, reset_after=60)
+    trip(breaker)
+    calls = []
+
+    with pytest.raises(UpstreamUnavailable, match="open"):
+        breaker.call(calls.append, 1)
+    assert calls == [] and breaker.open
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker(threshold=1, reset_after=0.05)
+    trip(breaker)
+    time.sleep(0.06)
+    trial_started, release = threading.Event(), threading.Event()
+
+    def slow_success():
+        trial_started.set()
+        release.wait(5)
+        return "ok"
+
+    results = []
+    trial = threading.Thread(target=lambda: results.append(breaker.call(slow_success)))
+    trial.start()
+    trial_started.wait(5)
+    with pytest.raises(UpstreamUnavailable, match="open"):
+        breaker.call(lambda: "second caller")
+    release.set()
+    trial.join()
+
+    assert results == ["ok"]
+    assert breaker.call(lambda: "closed") == "closed"
+
+
+def test_failed_trial_reopens_the_circuit():
+    breaker = CircuitBreaker(threshold=1, reset_after=0.05)
+    trip(breaker)
+    time.sleep(0.06)
+
+    with pytest.raises(UpstreamUnavailable, match="down"):
+        breaker.call(fail)
+    assert breaker.open
+
+
+def test_retries_stop_at_the_time_budget(monkeypatch):
+    monkeypatch.setattr(upstream.random, "uniform", lambda low, high: high)
+    calls = []
+
+    def flaky():
+        calls.append(time.monotonic())
+        raise ServerError()
+
+    start = time.monotonic()
+    with pytest.raises(UpstreamUnavailable):
+        with_retry(flaky, attempts=100, base_delay=0.05, max_delay=0.05, budget=0.3)
+
+    assert time.monotonic() - start < 0.3
+    assert 1 < len(calls) < 100
+
+
+def test_non_retryable_errors_are_raised_at_once():
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise KeyError("symbol")
+
+    with pytest.raises(KeyError):
+        with_retry(broken)
+    assert calls == [1]
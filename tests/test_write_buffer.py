@@ -0,0 +1,114 @@
+from datetime import datetime
+
+import mongomock
+import pytest
+from pymongo.errors import PyMongoError
+
+from write_buffer import WriteBehindBuffer
+
+
+class FlakyCollection:
+    """A mongomock collection whose next `failures` bulk writes raise."""
+
+    def __init__(self, collection, failures=1):
+        self.collection = collection
+        self.failures = failures
+
+    def bulk_write(self, ops, ordered=True):
+        if self.failures:
+            self.failures -= 1
+            raise PyMongoError("connection reset")
+        return self.collection.bulk_write(ops, ordered=ordered)
+
+    def update_one(self, *args, **kwargs):
+        return self.collection.update_one(*args, **kwargs)
+
+
+@pytest.fixture
+def collection():
+    return mongomock.MongoClient().db.names
+
+
+def snapshot(ticker, price):
+    return {"ticker": ticker, "price": price, "timestamp": datetime.utcnow()}
+
+
+def make_buffer(collection):
+    # A long interval keeps the background thread out of the way; the tests flush by hand
+    return WriteBehindBuffer(collection, flush_interval=60)
+
+
+def test_flush_writes_pending_upserts_in_one_batch(collection):
+    buffer = make_buffer(collection)
+    buffer.upsert("TCS.NS", {"ticker": "TCS.NS"}, snapshot("TCS.NS", 1))
+    buffer.upsert("INFY.NS", {"ticker": "INFY.NS"}, snapshot("INFY.NS", 2))
+    buffer.upsert("TCS.NS", {"ticker": "TCS.NS"}, snapshot("TCS.NS", 3))  # replaces the pending one
+
+    assert buffer.pending() == 2
+    assert buffer.flush() == 2
+    assert buffer.pending() == 0
+    assert collection.find_one({"ticker": "TCS.NS"})["price"] == 3
+    assert collection.count_documents({}) == 2
+    buffer.close()
+
+
+def test_unchanged_content_is_skipped(collection):
+    buffer = make_buffer(collection)
+    buffer.upsert("TCS.NS", {"ticker": "TCS.NS"}, snapshot("TCS.NS", 1))
+    buffer.flush()
+
+    buffer.upsert("TCS.NS", {"ticker": "TCS.NS"}, snapshot("TCS.NS", 1))  # only the timestamp differs
+    assert buffer.skipped == 1
+    assert buffer.pending() == 0
+
+    buffer.upsert("TCS.NS", {"ticker": "TCS.NS"}, snapshot("TCS.NS", 2))
+    assert buffer.pending() == 1
+    buffer.close()
+
+
+def test_skipped_upsert_drops_the_queued_one(collection):
+    buffer = make_buffer(collection)
+    buffer.upsert("TCS.NS", {"ticker": "TCS.NS"}, snapshot("TCS.NS", 1))
+    buffer.flush()
+    buffer.upsert("TCS.NS", {"ticker": "TCS.NS"}, snapshot("TCS.NS", 2))
+    buffer.upsert("TCS.NS", {"ticker": "TCS.NS"}, snapshot("TCS.NS", 1))  # back to what is stored
+
+    buffer.flush()
+    assert buffer.pending() == 0
+    assert collection.find_one({"ticker": "TCS.NS"})["price"] == 1
+    buffer.close()
+
+
+def test_failed_bulk_write_is_requeued(collection):
+    buffer = make_buffer(FlakyCollection(collection))
+    buffer.upsert("TCS.NS", {"ticker": "TCS.NS"}, snapshot("TCS.NS", 1))
+    buffer.upsert("INFY.NS", {"ticker": "INFY.NS"}, snapshot("INFY.NS", 1))
+
+    assert buffer.flush() == 0
+    assert buffer.pending() == 2
+    assert collection.count_documents({}) == 0
+
+    buffer.upsert("TCS.NS", {"ticker": "TCS.NS"}, snapshot("TCS.NS", 2))  # supersedes the failed one
+    assert buffer.flush() == 2
+    assert collection.find_one({"ticker": "TCS.NS"})["price"] == 2
+    assert collection.find_one({"ticker": "INFY.NS"})["price"] == 1
+    buffer.close()
+
+
+def test_close_drains_pending_upserts(collection):
+    buffer = make_buffer(collection)
+    buffer.upsert("TCS.NS", {"ticker": "TCS.NS"}, snapshot("TCS.NS", 1))
+    buffer.close()
+
+    assert buffer.pending() == 0
+    assert collection.find_one({"ticker": "TCS.NS"})["price"] == 1
+
+
+def test_upsert_after_close_writes_through(collection):
+    buffer = make_buffer(collection)
+    buffer.close()
+    buffer.upsert("TCS.NS", {"ticker": "TCS.NS"}, snapshot("TCS.NS", 1))
+
+    assert buffer.pending() == 0
+    assert buffer.flushed == 1
+    assert collection.find_one({"ticker": "TCS.NS"})["price"] == 1
@@ -0,0 +1,152 @@
+import os
+import random
+import threading
+import time
+from collections import Counter
+
+from curl_cffi import requests as curl_requests
+from yfinance.exceptions import YFRateLimitError
+
+YAHOO_SEARCH_URL = "https://query2.finance.yahoo.com/v1/finance/search"
+
+# (connect, read) timeouts in seconds for every Yahoo request
+TIMEOUT = (3.05, 10)
+RETRY_ATTEMPTS = 4
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+# Total seconds one with_retry call may spend, attempts and backoff included, before giving up
+RETRY_BUDGET = 20.0
+
+# Upstream outcomes, e.g. {"throttled": 3, "error": 1, "retry": 4, "circuit_open": 2}
+events = Counter()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class UpstreamUnavailable(Exception):
+    """Yahoo is throttling us, failing, or the circuit breaker is open."""
+
+
+def get_session():
+    """The shared keep-alive HTTP session for Yahoo (curl_cffi, as yfinance requires)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = curl_requests.Session(impersonate="chrome", timeout=TIMEOUT)
+        return _session
+
+
+def _forget_session():
+    # A forked worker opens its own connections instead of sharing the parent's sockets
+    global _session, _session_lock
+    _session = None
+    _session_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_session)
+
+
+def _status(exc):
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable(exc):
+    """Throttling (429), server errors (5xx), timeouts and dropped connections are worth retrying."""
+    if isinstance(exc, YFRateLimitError):
+        return True
+    status = _status(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(exc, (curl_requests.exceptions.Timeout, curl_requests.exceptions.ConnectionError))
+
+
+def _record(exc):
+    events["throttled" if isinstance(exc, YFRateLimitError) or _status(exc) == 429 else "error"] += 1
+
+
+def with_retry(fn, *args, attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+               budget=RETRY_BUDGET, **kwargs):
+    """Call `fn`, retrying retryable failures with full-jitter exponential backoff.
+
+    No retry is started once it would run past `budget` seconds from the first attempt.
+    """
+    deadline = time.monotonic() + budget
+    for attempt in range(attempts):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            _record(e)
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            if attempt == attempts - 1 or time.monotonic() + delay >= deadline:
+                raise UpstreamUnavailable(str(e)) from e
+            events["retry"] += 1
+            time.sleep(delay)
+
+
+class CircuitBreaker:
+    """Stops calling an upstream after `threshold` consecutive failures, for `reset_after` seconds.
+
+    After that a single trial call is let through (half-open) while everyone else still fails fast;
+    success closes the circuit again.
+    """
+
+    def __init__(self, threshold=5, reset_after=30.0):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def open(self):
+        return self.opened_at is not None and time.monotonic() - self.opened_at < self.reset_after
+
+    def call(self, fn, *args, **kwargs):
+        with self._lock:
+            trial = self.opened_at is not None and not self.open
+            if self.open or (trial and self._trial):
+                events["circuit_open"] += 1
+                raise UpstreamUnavailable("Circuit breaker is open")
+            self._trial = self._trial or trial
+        try:
+            result = fn(*args, **kwargs)
+        except UpstreamUnavailable:
+            with self._lock:
+                self.failures += 1
+                if self.failures >= self.threshold or self.opened_at is not None:
+                    self.opened_at = time.monotonic()  # (re)open; half-open trial failed too
+            raise
+        else:
+            with self._lock:
+                self.failures = 0
+                self.opened_at = None
+            return result
+        finally:
+            if trial:
+                with self._lock:
+                    self._trial = False
+
+
+yahoo_breaker = CircuitBreaker()
+
+
+def call_yahoo(fn, *args, **kwargs):
+    """Run one Yahoo request through the retry policy and the shared circuit breaker."""
+    return yahoo_breaker.call(with_retry, fn, *args, **kwargs)
+
+
+def search(query, quotes_count=10):
+    """Yahoo Finance symbol search (same endpoint as yahooquery.search) over the shared session."""
+    def request():
+        response = get_session().get(YAHOO_SEARCH_URL, params={
+            "q": query, "quotesCount": quotes_count, "newsCount": 0,
+            "lang": "en-US", "region": "US", "corsDomain": "finance.yahoo.com",
+        })
+        response.raise_for_status()
+        return response.json()
+    return call_yahoo(request)
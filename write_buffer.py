@@ -0,0 +1,120 @@
+import atexit
+import hashlib
+import json
+import threading
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from cache import TTLCache
+
+
+def fingerprint(doc, ignore=("timestamp",)):
+    """Stable hash of a document's content, leaving out fields that change on every write."""
+    payload = {k: v for k, v in doc.items() if k not in ignore}
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class WriteBehindBuffer:
+    """Collects `$set` upserts and writes them to a collection with one bulk_write per flush.
+
+    Upserts are keyed (e.g. by ticker): a newer upsert for a key replaces the pending one,
+    and an upsert whose content matches the last flushed write for that key is skipped
+    until `rewrite_after` seconds have passed, so unchanged documents still get their
+    timestamp refreshed now and then. A background thread flushes when `max_batch` upserts
+    are pending or every `flush_interval` seconds; close() drains what is left, and upserts
+    after close() are written straight through.
+    """
+
+    def __init__(self, collection, max_batch=100, flush_interval=2.0, rewrite_after=5 * 60, logger=None):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.logger = logger
+        self.flushed = 0
+        self.skipped = 0
+        self._pending = {}  # key -> (filter, doc, fingerprint)
+        self._written = TTLCache(maxsize=10_000, ttl=rewrite_after)  # key -> fingerprint
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = threading.Event()
+        self._thread = None
+
+    def upsert(self, key, filter, doc):
+        """Queue `{"$set": doc}` for the document matching `filter`; only blocks on MongoDB after close()."""
+        digest = fingerprint(doc)
+        if self._written.get(key) == digest:
+            with self._lock:
+                self._pending.pop(key, None)  # an older queued upsert would overwrite this content
+            self.skipped += 1
+            return
+        with self._lock:
+            closed = self._closed.is_set()
+            if not closed:
+                self._pending[key] = (filter, doc, digest)
+                full = len(self._pending) >= self.max_batch
+        if closed:
+            self._write_through(key, filter, doc, digest)
+            return
+        self._start()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything pending now; returns the number of upserts sent."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            ops = [UpdateOne(filter, {"$set": doc}, upsert=True) for filter, doc, _ in batch.values()]
+            try:
+                self.collection.bulk_write(ops, ordered=False)
+            except PyMongoError as e:
+                if self.logger:
+                    self.logger.warning("Bulk write of %d documents failed: %s", len(ops), e)
+                with self._lock:
+                    for key, entry in batch.items():
+                        self._pending.setdefault(key, entry)  # retry unless superseded
+                return 0
+            for key, (_, _, digest) in batch.items():
+                self._written.set(key, digest)
+            self.flushed += len(ops)
+            return len(ops)
+
+    def _write_through(self, key, filter, doc, digest):
+        # Nothing flushes after close(), so write now rather than queue an upsert that is never sent
+        try:
+            self.collection.update_one(filter, {"$set": doc}, upsert=True)
+        except PyMongoError as e:
+            if self.logger:
+                self.logger.warning("Write of %r after close failed: %s", key, e)
+            return
+        self._written.set(key, digest)
+        self.flushed += 1
+
+    def pending(self):
+        return len(self._pending)
+
+    def _run(self):
+        while not self._closed.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None or self._closed.is_set():
+                return
+            self._thread = threading.Thread(target=self._run, name="mongo-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def close(self):
+        """Stop the flusher thread and drain the remaining upserts."""
+        self._closed.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()